@@ -11,8 +11,15 @@
 import time
 import uos
 import math
-import machine, neopixel
+import array
+import machine
 from machine import Pin
+# Pixel output shared with clock.py, PIO on the Pico and the neopixel driver elsewhere
+from pixels import makeOutput
+# Integer random maths, so drawing a song allocates no floats
+from fixedpoint import randomInRange
+# Candle state for the whole strip in parallel arrays
+from candlestrip import CandleStrip
 # Import the music class from the buzzer_music module for easy song playback.
 from buzzer_music import music
 
@@ -87,91 +94,6 @@ class VibrationSensor(object):
             return False
   
 
-class EmberLight(object):
-        
-    RED = 255
-    GREEN = 30
-    BLUE = 10
-    
-    def __init__(self, pos):
-        self.time = 0
-        self.pos = pos    
-
-    def update(self, delta):
-        self.time = self.time - delta
-        if self.time <= 0:
-            self.mode()
-            self.duration()
-
-    def set_brightness(self, brightness):
-        setPixelColor(self.pos, color(c_brightness(self.RED, brightness), c_brightness(self.GREEN, brightness), c_brightness(self.BLUE, brightness)))
-
-    def mode(self):
-        brightness = 40
-        self.set_brightness(brightness)
-
-    def duration(self):
-        duration = 20
-        self.time = duration
-
-                    
-class GlowLight(object):
-    
-    RED = 255
-    GREEN = 120
-    BLUE = 10
-    
-    def __init__(self, pos):
-        self.time = 0
-        self.pos = pos
-
-    def update(self, delta):
-        self.time = self.time - delta
-        if self.time <= 0:
-            self.random_mode()
-            self.random_duration()
-
-    def set_brightness(self, brightness):
-        setPixelColor(self.pos, color(c_brightness(self.RED, brightness), c_brightness(self.GREEN, brightness), c_brightness(self.BLUE, brightness)))
-
-
-    def random_mode(self):
-        # Probability Random LED Brightness
-        # 50% 77% â€“  80% (its barely noticeable)
-        # 30% 80% â€“ 100% (very noticeable, sim. air flicker)
-        #  5% 50% â€“  80% (very noticeable, blown out flame)
-        #  5% 40% â€“  50% (very noticeable, blown out flame)
-        # 10% 30% â€“  40% (very noticeable, blown out flame)
-        brightness = 0
-        r = randint(0, 100)
-        if r < 50:
-            brightness = randint(77, 80)
-        elif r < 80:
-            brightness = randint(80, 100)
-        elif r < 85:
-            brightness = randint(50, 80)
-        elif r < 90:
-            brightness = randint(40, 50)
-        else:
-            brightness = randint(30, 40)
-        self.set_brightness(brightness)
-
-    def random_duration(self):
-        # Probability Random Time
-        # 90% 20 ms
-        #  3% 20 â€“ 30 ms
-        #  3% 10 â€“ 20 ms
-        #  4%  0 â€“ 10 ms
-        r = randint(0, 100)
-        if r < 90:
-            self.time = 20
-        elif r < 93:
-            self.time = randint(20, 30)
-        elif r < 96:
-            self.time = randint(10, 20)
-        else:
-            self.time = randint(0, 10)
-
 # ======================================================================================
 
 # number of leds in the strip
@@ -179,38 +101,35 @@ LED_COUNT = 16
 # Pico pin
 GPIO_PIN = 16
 
-np = neopixel.NeoPixel(machine.Pin(GPIO_PIN), LED_COUNT) #28
+# Packed GRB frame, see pixels.py
+frame = array.array("I", [0 for _ in range(LED_COUNT)])
 
-def show():
-   np.write()
-
-def color(r, g, b):
-    return (int(r), int(g), int(b))
+output = makeOutput(LED_COUNT, GPIO_PIN) #28
 
-def setPixelColor(i, color):
-    np[i] = color
+def show():
+   output.write(frame)
 
 def wait(ms):
    time.sleep(ms/1000.0)
 
 def randint(min, max):
-    return min + int(int.from_bytes(uos.urandom(2), 10) / 65536.0 * (max - min + 1))
-
-def c_brightness(c, brightness):
-    return max(0, min(c * brightness / 100, 255))
+    return randomInRange(int.from_bytes(uos.urandom(2), 10), min, max)
 
-def lightCandles(candles):
+# Advance every candle by the time since the last frame and show the strip
+def lightCandles(strip, mode, last):
     now = time.ticks_ms()
-    [l.update(now) for l in candles]
+    strip.setMode(mode)
+    strip.update(time.ticks_diff(now, last))
     show()
+    return now
         
 def main():
     wait(10)
     
     buzzer = Buzzer()
 
-    glowCandles = [GlowLight(i) for i in range(LED_COUNT)]
-    emberCandles = [EmberLight(i) for i in range(LED_COUNT)]
+    strip = CandleStrip(frame, LED_COUNT)
+    last = time.ticks_ms()
 
     vibrationSensor = VibrationSensor()
 
@@ -219,10 +138,10 @@ def main():
         vibration = vibrationSensor.isVibration()  
 
         if (vibration):
-            lightCandles(emberCandles)
+            last = lightCandles(strip, CandleStrip.EMBER, last)
             buzzer.play()
         else:
-            lightCandles(glowCandles)
+            last = lightCandles(strip, CandleStrip.GLOW, last)
     
         wait(60)
         
@@ -0,0 +1,57 @@
+import array
+import time
+from candlestrip import CandleStrip
+from ringbench import wireTimeUs
+
+"""
+Candle benchmark
+================
+
+Frame time of the Candle.py strip simulation against LED count.
+
+For each strip length CandleStrip.update is timed over FRAMES frames, advancing
+20 ms a frame so most LEDs draw a new level on most frames, the worst case for
+the glow mode. The wire time for the frame, from ringbench.py, is added to give
+the total against FRAME_BUDGET_MS, the time the candles hold a level.
+
+Timings on the host are much faster than on the Pico, so run it on the Pico
+for absolute numbers; on the host it shows how frame time scales.
+
+Run with:
+    python candlebench.py
+"""
+
+LED_COUNTS = (16, 150, 200, 250, 300)
+FRAMES = 200
+FRAME_MS = 20
+FRAME_BUDGET_MS = 20
+
+try:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+def updateTimeUs(count):
+    frame = array.array("I", [0 for _ in range(count)])
+    strip = CandleStrip(frame, count)
+    start = ticks_us()
+    for i in range(FRAMES):
+        strip.update(FRAME_MS)
+    return ticks_diff(ticks_us(), start) / FRAMES
+
+def main():
+    print("LEDs   update us   wire us   frame us   budget us")
+    for count in LED_COUNTS:
+        update = updateTimeUs(count)
+        wire = wireTimeUs(count)
+        total = update + wire
+        print("{:>4} {:>11.1f} {:>9} {:>10.1f} {:>11} {}".format(
+            count, update, wire, total, FRAME_BUDGET_MS * 1000, "" if total <= FRAME_BUDGET_MS * 1000 else "OVER"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import array
+from fixedpoint import percentOf
+from pixels import packGRB
+from flicker import BRIGHTNESS_CHANCES, HOLD_CHANCES, draw, xorshift
+
+"""
+Candle strip
+============
+
+Candle simulation for a whole LED strip, stored as parallel arrays rather than
+one object per LED, and updated in a single loop that writes straight into the
+packed GRB frame from pixels.py.
+
+Per LED there is a countdown timer and a brightness level. When an LED's timer
+runs out a new level and hold time are drawn. Rather than calling a random
+function per LED, one 16 bit xorshift value indexes two 256 entry tables built
+at start-up from the candle probabilities: its low byte picks the level and its
+high byte the hold time. The colour of every level is also precomputed, so the
+loop only does array lookups and integer arithmetic and allocates nothing.
+
+Modes:
+    GLOW: candle flicker, from the GlowLight probabilities
+    EMBER: a steady dim ember, as EmberLight
+
+The module runs on the host, see candlebench.py.
+"""
+
+TABLE_SIZE = 256
+MAX_LEVEL = 100
+
+# Steady ember brightness in percent and hold in ms
+EMBER_LEVEL = 40
+EMBER_HOLD_MS = 20
+
+"""
+Precompute the packed colour of every brightness level.
+
+Args:
+    red (int): Red at full brightness.
+    green (int): Green at full brightness.
+    blue (int): Blue at full brightness.
+
+Returns:
+    array.array: Packed GRB value for each level, 0 to 100 percent.
+"""
+def levelColors(red, green, blue):
+    return array.array("I", [packGRB(percentOf(red, p), percentOf(green, p), percentOf(blue, p))
+                             for p in range(MAX_LEVEL + 1)])
+
+"""
+Precompute a table of draws from a probability table.
+
+Args:
+    chances (tuple): (cumulative chance, lowest, highest) ranges, see flicker.py.
+    seed (int): Seed for the draws.
+
+Returns:
+    bytearray: TABLE_SIZE draws.
+"""
+def drawTable(chances, seed):
+    table = bytearray(TABLE_SIZE)
+    r = seed
+    for i in range(TABLE_SIZE):
+        table[i], r = draw(chances, r)
+    return table
+
+##############################
+"""
+CandleStrip class simulating a candle on every LED of a strip.
+
+Attributes:
+    GLOW (int): Flickering candle mode.
+    EMBER (int): Steady ember mode.
+    frame (array.array): Packed GRB frame written by update.
+    count (int): Number of LEDs.
+    timers (array.array): Time left at the current level for each LED, in ms.
+    levels (bytearray): Current brightness level of each LED, in percent.
+    mode (int): The current mode.
+
+Methods:
+    setMode(mode): Switch between GLOW and EMBER.
+    update(delta): Advance every LED by delta ms and write the frame.
+"""
+class CandleStrip(object):
+
+    GLOW = 0
+    EMBER = 1
+
+    GLOW_COLOR = (255, 120, 10)
+    EMBER_COLOR = (255, 30, 10)
+
+    def __init__(self, frame, count, seed=1):
+        self.frame = frame
+        self.count = count
+        self.timers = array.array("h", [0 for _ in range(count)])
+        self.levels = bytearray(count)
+        self.random = (seed & 0xFFFF) or 1
+
+        # Colours, levels and holds for each mode
+        self.colorTables = (levelColors(*self.GLOW_COLOR), levelColors(*self.EMBER_COLOR))
+        self.levelTables = (drawTable(BRIGHTNESS_CHANCES, self.random),
+                            bytearray([EMBER_LEVEL for _ in range(TABLE_SIZE)]))
+        self.holdTables = (drawTable(HOLD_CHANCES, xorshift(self.random)),
+                           bytearray([EMBER_HOLD_MS for _ in range(TABLE_SIZE)]))
+
+        self.mode = None
+        self.setMode(self.GLOW)
+
+    """
+    Switch mode. Every LED draws its first level in the new mode on the next update.
+
+    Args:
+        mode (int): GLOW or EMBER.
+
+    Returns:
+        None
+    """
+    def setMode(self, mode):
+        if (mode == self.mode):
+            return
+        self.mode = mode
+        self.colors = self.colorTables[mode]
+        self.levelTable = self.levelTables[mode]
+        self.holdTable = self.holdTables[mode]
+
+        timers = self.timers
+        for i in range(self.count):
+            timers[i] = 0
+
+    def update(self, delta):
+        frame = self.frame
+        timers = self.timers
+        levels = self.levels
+        colors = self.colors
+        levelTable = self.levelTable
+        holdTable = self.holdTable
+        r = self.random
+
+        for i in range(self.count):
+            t = timers[i] - delta
+            if (t <= 0):
+                r = r ^ ((r << 7) & 0xFFFF)
+                r = r ^ (r >> 9)
+                r = r ^ ((r << 8) & 0xFFFF)
+                level = levelTable[r & 0xFF]
+                levels[i] = level
+                frame[i] = colors[level]
+                t = holdTable[r >> 8]
+            timers[i] = t
+
+        self.random = r
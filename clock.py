@@ -1,12 +1,19 @@
-from machine import Pin, I2C, PWM
+from machine import Pin, I2C, PWM, ADC, lightsleep
 import ssd1306
 import ds1302
 import time
 import array
-import rp2
-import math
 import dht
-import random
+import gc
+from pixels import PioOutput
+from lightstar import LightStar
+from renderer import RingRenderer, secondPixels, dimTable
+from schedule import Schedule
+from sensorlog import SensorLog, minuteStamp
+from history import SensorHistory
+from settings import SettingsStore
+from fixedpoint import intervalMap, servoDuty
+from flicker import FlickerOutput, flickerPattern, steadyPattern, PATTERN_LENGTH
   
     
 """
@@ -22,7 +29,17 @@ Clock code to control:
  - A servo motor to chime hourly.
 
 The code continuously displays the current datetime on the OLED display, and updates the NeoPixel ring to show the seconds.
-If it is between 9am and 9pm, the servo motor will chime the hour.
+At boot the RTC and OLED are brought up first so that the time is shown as early as possible.
+The servo, chime LEDs and sensor are initialised lazily on first use, and a boot-time breakdown is printed.
+The first frame shows placeholders for the temperature and humidity rather than waiting for the sensor.
+While the lights are on their brightness follows the room: the light level picks one of a few
+brightness steps, each with precomputed tables for the ring, star, candles and OLED contrast.
+What happens in each minute of the day is set by CLOCK_RULES. By default, between 9am and 10:59pm
+the ring, star and candles light up when it is dark and the servo motor chimes on the hour.
+
+At night, and in daylight when the lights are off, the clock idles: outputs are only written
+when they change, the OLED is dimmed and refreshed once a minute, and the CPU lightsleeps
+until the next minute or a button press.
 
 The code also allows the user to adjust the volume of the chime using a volume button.
 The user can also adjust the hour, minute, and second using separate buttons.
@@ -32,117 +49,213 @@ The code uses the following libraries:
 - ssd1306: for OLED display
 - ds1302: for RTC
 - time: for time-related functions
-- rp2: for Rasbperry Pi Pico hardware access
-- math: for mathematical operations
+- pixels: for the ws2812 PIO output shared with Candle.py
+- lightstar: for the RGB LED star shared with star.py
+- gc: to schedule garbage collection in idle time
+- renderer: to render the NeoPixel ring on the second core
+- schedule: to compile the daily schedule into a per-minute lookup
+- sensorlog: to log temperature, humidity and light level to flash once a minute
+- history: to keep the last 24 hours of temperature and humidity for the OLED history page
+- settings: to keep the chime volume and ring color across power cycles
+- fixedpoint: for integer servo maths, so moving the servo allocates no floats
+- flicker: to flicker the candles from PIO and DMA with no CPU cost
+
+The steady-state loop reuses preallocated buffers and constant strings so that
+it allocates nothing per pass. Garbage collection is run explicitly while the
+loop is idle, so it never interrupts an animation. tests/test_clock_heap.py runs the
+loop on the host board from hostboard.py and checks that the heap stays flat.
 
 The code is written in Python and is designed to run on a Raspberry Pi Pico board.
 """
 
+
+# Daily schedule as (action, firstHour, lastHour, minutes, strikes) rules, see schedule.py
+CLOCK_RULES = (
+    (Schedule.ACTIVE, 9, 22, None, 0),
+    (Schedule.CHASE, 9, 22, (14, 29, 44), 0),
+    (Schedule.RAINBOW, 9, 22, (59,), 0),
+    (Schedule.CHIME, 9, 22, (0,), 1),
+)
+
+# The rainbow runs during the first RAINBOW_SECONDS of a RAINBOW minute
+RAINBOW_SECONDS = 45
+
+# Time to sleep between passes of the main loop
+LOOP_SLEEP_MS = 500
+
+# User settings kept on flash, with their defaults
+SETTINGS_PREFIX = "settings"
+SETTINGS_NAMES = ("volume", "colorIndex")
+SETTINGS_DEFAULTS = (4, 1)
+# Set with a button, so written soon after a change
+SETTINGS_URGENT = ("volume",)
+
+# Minute ring drawn by the second ring's renderer: (LEDs, pin, state machine), None if not fitted
+MINUTE_RING = (60, 1, 1)
+
+# Ring file on flash holding a week of one minute sensor records
+SENSOR_LOG_PATH = "sensors.log"
+
+# The OLED shows the 24 hour history page from this second of each minute
+HISTORY_FIRST_SECOND = 50
     
-@rp2.asm_pio(sideset_init=rp2.PIO.OUT_LOW, out_shiftdir=rp2.PIO.SHIFT_LEFT, autopull=True, pull_thresh=24)
-def ws2812():
-    T1 = 2
-    T2 = 5
-    T3 = 3
-    wrap_target()
-    label("bitloop")
-    out(x, 1)               .side(0)    [T3 - 1]
-    jmp(not_x, "do_zero")   .side(1)    [T1 - 1]
-    jmp("bitloop")          .side(1)    [T2 - 1]
-    label("do_zero")
-    nop()                   .side(0)    [T2 - 1]
-    wrap()
-    
-##############################
+########################################################################## 
 """
-LightStar - interface to RGB LED
+PhotoResistor - filtered, hysteretic ambient light detection.
 
-Methods:
-    illuminate
-"""
-class LightStar(object):
+The ADC is oversampled and smoothed with an integer exponential moving average.
+It becomes dark above DARK_ON_THRESHOLD and light again below DARK_OFF_THRESHOLD,
+and a new state must hold for DWELL_SAMPLES samples before it is accepted, so
+readings near dusk do not flap between dark and light. The active loop samples
+every LOOP_SLEEP_MS, so the dwell is MIN_DWELL_MS there.
 
-    def __init__(self): 
-        # Initialize PWM for each color channel of an RGB LED
-        self.red = PWM(Pin(2))  # Red channel on GPIO pin 26
-        self.green = PWM(Pin(6))  # Green channel on GPIO pin 27
-        self.blue = PWM(Pin(7))  # Blue channel on GPIO pin 28
-
-        # Set 1000 Hz frequency for all channels
-        self.red.freq(1000)
-        self.green.freq(1000)
-        self.blue.freq(1000)
-        
-        self.MAX_BRIGHTNESS = 65535
-        self.MIN_BRIGHTNESS = 5535
-
-    # Function to set RGB LED color
-    def light(self, r, g, b):
-        self.red.duty_u16(r)  # Red intensity
-        self.green.duty_u16(g)  # Green intensity
-        self.blue.duty_u16(b)  # Blue intensity
-
-    # Method to set RGB LED color
-    def off(self):
-        self.light(0, 0, 0)  # White
-        
-    # Method to set RGB LED color
-    def illuminate(self, hour):
-                  
-        MULTIPLIER = 3600
-        greenBrightness = 32000
-        
-        redBrightness = (hour * MULTIPLIER) +  20000
-        
-        hour  = abs(hour - 23)
-        blueBrightness = abs((hour * MULTIPLIER) - 10000)
-        
-        if (redBrightness >= self.MAX_BRIGHTNESS):
-            redBrightness = self.MAX_BRIGHTNESS
-            
-        if (blueBrightness >= self.MAX_BRIGHTNESS):
-            blueBrightness = 0           
-          
-        print("Red Brightness: " + str(redBrightness))
-        print("Blue Brightness: " + str(blueBrightness))
-        
-        self.light(redBrightness, greenBrightness, blueBrightness)      
+After an idle sleep the filtered level is up to a minute old. The caller then
+asks for SETTLE_SAMPLES samples at once, which settles the average and the
+dwell on the current light, so the lights come on at the first wake after dark
+rather than several minutes later.
 
-########################################################################## 
+The light level also selects a brightness step, 0 in the darkest room. Step k
+starts below STEP_LEVELS[k - 1], and the level must pass a boundary by
+STEP_HYSTERESIS before the step changes.
+
+Attributes:
+    lightLevel (int): Filtered light level, higher is darker.
+    dark (bool): The accepted dark state.
+    transitions (int): Number of accepted dark/light transitions.
+    step (int): The accepted brightness step.
+
+Methods:
+    isDark(samples): Sample the light level and return the accepted dark state.
+    brightnessStep(): Return the brightness step for the filtered light level.
+"""
 class PhotoResistor(object):
 
     ADC_PIN = 26
-    DARK_THRESHOLD = 50000
+    DARK_ON_THRESHOLD = 52000
+    DARK_OFF_THRESHOLD = 48000
+    MIN_DWELL_MS = 5000
+    DWELL_SAMPLES = MIN_DWELL_MS // LOOP_SLEEP_MS
+    
+    # Number of ADC reads averaged per sample, as a power of two
+    OVERSAMPLE_SHIFT = 2
+    
+    # Weight of a new sample in the moving average is 1 / 2**EMA_SHIFT
+    EMA_SHIFT = 2
+    
+    # Samples taken after an idle sleep, the old level then weighs (3/4)**16, about 1%
+    SETTLE_SAMPLES = 16
+    
+    # Light levels at which each brighter step starts, giving STEP_COUNT steps
+    STEP_LEVELS = (60000, 56000, 52000)
+    STEP_COUNT = len(STEP_LEVELS) + 1
+    STEP_HYSTERESIS = 1000
     
     def __init__(self):   
-        # Initialize DHT11 sensor on GPIO
-        self.photoresistor = machine.ADC(self.ADC_PIN)  # Initialize ADC on pin 26
+        self.photoresistor = ADC(self.ADC_PIN)  # Initialize ADC on pin 26
+        
+        self.lightLevel = self.sample()
+        self.dark = self.lightLevel > self.DARK_ON_THRESHOLD
+        self.pendingSamples = 0
+        self.transitions = 0
+        
+        self.step = 0
+        for level in self.STEP_LEVELS:
+            if (self.lightLevel < level):
+                self.step = self.step + 1
+
+    # Read the oversampled light level
+    def sample(self):
+        total = 0
+        for i in range(1 << self.OVERSAMPLE_SHIFT):
+            total = total + self.photoresistor.read_u16()  # Read analog value
+        return total >> self.OVERSAMPLE_SHIFT
+
+    def isDark(self, samples=1):
+        for i in range(samples):
+            self.lightLevel = self.lightLevel + ((self.sample() - self.lightLevel) >> self.EMA_SHIFT)
+            #print("Light level: " + str(self.lightLevel))  # Print the value
+            
+            if (self.dark):
+                crossed = self.lightLevel < self.DARK_OFF_THRESHOLD
+            else:
+                crossed = self.lightLevel > self.DARK_ON_THRESHOLD
+                
+            if not crossed:
+                self.pendingSamples = 0
+                continue
+            
+            self.pendingSamples = self.pendingSamples + 1
+            if (self.pendingSamples >= self.DWELL_SAMPLES):
+                self.dark = not self.dark
+                self.pendingSamples = 0
+                self.transitions = self.transitions + 1
+                print("Light transitions:", self.transitions)
+            
+        return self.dark
 
-    def isDark(self):
-        lightLevel = self.photoresistor.read_u16()  # Read analog value
-        #print("Light level: " + str(lightLevel))  # Print the value
+    def brightnessStep(self):
+        level = self.lightLevel
+        step = self.step
         
-        if (lightLevel > self.DARK_THRESHOLD):
-            #print("Light ON")
-            return True
-        else:
-            #print("LIGHT OFF")
-            return False
+        while (step < self.STEP_COUNT - 1 and level < self.STEP_LEVELS[step] - self.STEP_HYSTERESIS):
+            step = step + 1
+        while (step > 0 and level > self.STEP_LEVELS[step - 1] + self.STEP_HYSTERESIS):
+            step = step - 1
+            
+        self.step = step
+        return step
 
 
 ########################################################################## 
+"""
+TemperatureHumiditySensor - DHT11 temperature and humidity.
+
+The DHT11 needs about a second after power-up before it answers, and at most one
+measurement a second after that. read measures at most every READ_INTERVAL_MS
+and otherwise returns the last good reading, and a failed measurement keeps the
+last good reading, so the sensor never delays or crashes the main loop.
+
+Methods:
+    read(): Return [temperature, humidity], or None until the first good measurement.
+"""
 class TemperatureHumiditySensor(object):
     
     GPIO_PIN = 28
+    STARTUP_MS = 1000
+    READ_INTERVAL_MS = 2000
     
     def __init__(self):   
-        # Initialize DHT11 sensor on GPIO
-        self.sensor = dht.DHT11(machine.Pin(self.GPIO_PIN))
+        # The DHT11 sensor is initialized on first read, keeping it off the boot path
+        self.sensor = None
+        self.startMs = time.ticks_ms()
+        self.readMs = None
+        
+        # Reused on every read so that reading the sensor allocates nothing
+        self.reading = [0, 0]
+        self.current = None
 
     def read(self):
-        self.sensor.measure()
+        now = time.ticks_ms()
+        if (time.ticks_diff(now, self.startMs) < self.STARTUP_MS):
+            return self.current
+        if (self.readMs is not None and time.ticks_diff(now, self.readMs) < self.READ_INTERVAL_MS):
+            return self.current
+        self.readMs = now
+        
+        if (self.sensor is None):
+            # Initialize DHT11 sensor on GPIO
+            self.sensor = dht.DHT11(Pin(self.GPIO_PIN))
+            
+        try:
+            self.sensor.measure()
+        except OSError:
+            print("DHT11 read failed")
+            return self.current
         
-        return [self.sensor.temperature(), self.sensor.humidity()]
+        self.reading[0] = self.sensor.temperature()
+        self.reading[1] = self.sensor.humidity()
+        self.current = self.reading
+        return self.current
         #print("Temperature:" ,d.temperature())  # Print temperature
         #print("Humidity:" ,d.humidity())  # Print humidity
         
@@ -151,10 +264,19 @@ class TemperatureHumiditySensor(object):
 """
 NeoPixelRing class for controlling NeoPixel rings.
 
+Rings of any length are supported: each logical second lights the pixels from
+secondPixel[sec] up to secondPixel[sec + 1], so a 120, 144 or 240 LED ring still
+shows one second per step. Each ring has its own PioOutput, with its own PIO
+StateMachine and, where the firmware provides rp2.DMA, its own DMA channel. A
+second ring, such as the minute ring, is rendered by the first ring's renderer
+on core 1, which writes both outputs back to back so they transmit together.
+
 Attributes:
     NUM_LEDS (int): Number of WS2812 LEDs.
     PIN_NUM (int): Pin number for outputting data.
+    SM_ID (int): PIO StateMachine used to drive the ring, 0 to 7.
     BRIGHTNESS (float): Brightness level for the LEDs.
+    STEP_SCALES (tuple): Brightness of each PhotoResistor step as a 16 bit fixed point multiplier.
     BLACK (tuple): RGB value for black.
     RED (tuple): RGB value for red.
     YELLOW (tuple): RGB value for yellow.
@@ -165,14 +287,19 @@ Attributes:
     WHITE (tuple): RGB value for white.
     COLORS (tuple): Tuple of RGB values for colors.
     NUMBER_OF_COLORS (int): Number of colors in the COLORS tuple.
-    sm (rp2.StateMachine): StateMachine for outputting data.
+    output (PioOutput): Pixel output driving the ring.
     ar (array.array): Array of LED RGB values.
+    secondPixel (array.array): First pixel of each logical second.
+    dimTable (bytearray): Dimmed value of every channel value.
+    dimTables (tuple): Precomputed dimTable for each brightness step.
     colorIndex (int): Index of the current color in the COLORS tuple.
+    renderer (RingRenderer): Renderer running on core 1, or None to render on the calling core.
 
 Methods:
-    __init__(self): Initializes the NeoPixelRing object.
+    __init__(self, numLeds, pinNum, smId): Initializes the NeoPixelRing object.
     setBrightness(self, level): Sets the brightness level for the LEDs.
-    pixels_show(self): Shows the LEDs with the current RGB values.
+    setStep(self, step): Switches to the brightness of a PhotoResistor step.
+    pixels_show(self, wait): Shows the LEDs with the current RGB values.
     pixels_set(self, i, color): Sets the RGB value of a specific LED.
     pixels_fill(self, color): Fills all LEDs with a specific RGB value.
     clockTick(self, color, wait): Performs a clock tick animation.
@@ -181,14 +308,23 @@ Methods:
     wheel(self, pos): Calculates the RGB value for a specific position.
     rainbow_cycle(self, wait): Performs a rainbow cycle animation.
     getNextColor(self): Gets the next color in the COLORS tuple.
+    startRenderer(self, others): Moves rendering of this ring and others to the second core.
+    setMarkers(self, color): Shows or hides the 0/15/30/45 second markers.
 """
 class NeoPixelRing(object):
 
     # Configure the number of WS2812 LEDs.
     NUM_LEDS = 60 
     PIN_NUM = 0
+    SM_ID = 0
     BRIGHTNESS = 0.1
     
+    # Darkest room first, BRIGHTNESS is the third step
+    STEP_SCALES = (3277, 4915, 6553, 9830)
+    
+    # Time for the WS2812s to latch a frame
+    LATCH_MS = 10
+    
     # COLORS
     BLACK = (0, 0, 0)
     RED = (255, 0, 0)
@@ -199,20 +335,56 @@ class NeoPixelRing(object):
     PURPLE = (180, 0, 255)
     WHITE = (255, 255, 255)
     COLORS = (WHITE, CYAN, BLUE, PURPLE, RED, GREEN, YELLOW)
+    MARKER_COLOR = RED
+    MINUTE_COLOR = BLUE
     NUMBER_OF_COLORS = len(COLORS)
 
-    def __init__(self): 
+    def __init__(self, numLeds=60, pinNum=0, smId=0): 
     
-        # Create the StateMachine with the ws2812 program, outputting on pin
-        self.sm = rp2.StateMachine(0, ws2812, freq=8_000_000, sideset_base=Pin(self.PIN_NUM))
-
-        # Start the StateMachine, it will wait for data on its FIFO.
-        self.sm.active(1)
+        self.NUM_LEDS = numLeds
+        self.PIN_NUM = pinNum
+        self.SM_ID = smId
+    
+        # Drive the ring from the ws2812 PIO program on the given StateMachine
+        self.output = PioOutput(numLeds, pinNum, smId)
 
         # Display a pattern on the LEDs via an array of LED RGB values.
-        self.ar = array.array("I", [0 for _ in range(self.NUM_LEDS)])
+        self.ar = array.array("I", [0 for _ in range(numLeds)])
+        
+        # Dimmed copy of self.ar that is written to the output, reused on every show
+        self.dimmer_ar = array.array("I", [0 for _ in range(numLeds)])
+        
+        # First pixel of each logical second, and one past the last pixel of second 59
+        self.secondPixel = secondPixels(numLeds)
+        
+        # Dimming is a table lookup per channel, one table per brightness step
+        self.dimTables = tuple(dimTable(scale) for scale in self.STEP_SCALES)
+        self.dimTable = dimTable(int(self.BRIGHTNESS * 65536))
+        
+        # Packed GRB value for every wheel position, so rainbow_cycle creates no tuples
+        self.wheelTable = array.array("I", [self.pack(self.wheel(pos)) for pos in range(256)])
         
         self.colorIndex = 0
+        
+        self.renderer = None
+
+    """
+    Move rendering to a RingRenderer running on the second core.
+    From then on pixels_fill, color_chase, tick and rainbow_cycle publish scene
+    commands and return immediately.
+
+    Args:
+        others (tuple): Other NeoPixelRing objects rendered by the same loop.
+
+    Returns:
+        None
+    """
+    def startRenderer(self, others=()):
+        self.renderer = RingRenderer(self.output, self.NUM_LEDS, self.wheelTable, self.dimTable)
+        for ring in others:
+            ring.renderer = RingRenderer(ring.output, ring.NUM_LEDS, ring.wheelTable, ring.dimTable)
+            self.renderer.addRing(ring.renderer)
+        self.renderer.start()
 
     """
     Private
@@ -227,24 +399,59 @@ class NeoPixelRing(object):
     """
     def setBrightness(self, level):
         self.BRIGHTNESS = level
+        self.setDimTable(dimTable(int(level * 65536)))
+
+    """
+    Switch to the precomputed brightness of a PhotoResistor step.
+
+    Args:
+        step (int): The brightness step.
+
+    Returns:
+        None
+    """
+    def setStep(self, step):
+        self.setDimTable(self.dimTables[step])
+
+    """
+    Private
+
+    Use a dimming table, see renderer.dimTable.
+
+    Args:
+        table (bytearray): The dimming table.
+
+    Returns:
+        None
+    """
+    def setDimTable(self, table):
+        self.dimTable = table
+        
+        if self.renderer:
+            self.renderer.setDimTable(table)
 
     """
     Private
     
     Show the pixels with the current brightness level.
 
+    Args:
+        wait (bool): Wait for the LEDs to latch the frame before returning.
+
     Returns:
         None
     """
-    def pixels_show(self):
-        dimmer_ar = array.array("I", [0 for _ in range(self.NUM_LEDS)])
-        for i,c in enumerate(self.ar):
-            r = int(((c >> 8) & 0xFF) * self.BRIGHTNESS)
-            g = int(((c >> 16) & 0xFF) * self.BRIGHTNESS)
-            b = int((c & 0xFF) * self.BRIGHTNESS)
-            dimmer_ar[i] = (g<<16) + (r<<8) + b
-        self.sm.put(dimmer_ar, 8)
-        time.sleep_ms(10)
+    def pixels_show(self, wait=True):
+        ar = self.ar
+        dimmer_ar = self.dimmer_ar
+        dim = self.dimTable
+        for i in range(self.NUM_LEDS):
+            c = ar[i]
+            dimmer_ar[i] = (dim[(c >> 16) & 0xFF] << 16) + (dim[(c >> 8) & 0xFF] << 8) + dim[c & 0xFF]
+        self.output.write(dimmer_ar)
+            
+        if wait:
+            time.sleep_ms(self.LATCH_MS)
 
     """
     Private
@@ -260,6 +467,20 @@ class NeoPixelRing(object):
     """
     def pixels_set(self, i, color):
         self.ar[i] = (color[1]<<16) + (color[0]<<8) + color[2]
+
+    """
+    Private
+    
+    Pack an RGB color into the GRB layout used by the pixel buffer.
+
+    Args:
+        color (tuple): A tuple of three integers representing the RGB color values.
+
+    Returns:
+        int: The packed GRB value.
+    """
+    def pack(self, color):
+        return (color[1]<<16) + (color[0]<<8) + color[2]
         
     """
     Private
@@ -295,6 +516,10 @@ class NeoPixelRing(object):
         None
     """
     def pixels_fill(self, color):
+        if self.renderer:
+            self.renderer.fill(self.pack(color))
+            return
+            
         for i in range(len(self.ar)):
             self.pixels_set(i, color)
         self.pixels_show()
@@ -310,15 +535,21 @@ class NeoPixelRing(object):
         None
     """   
     def color_chase(self, color, wait):
+        if self.renderer:
+            # Let a running animation finish rather than restarting it every pass
+            if not self.renderer.busy():
+                self.renderer.chase(self.pack(color))
+            return
+            
         for i in range(self.NUM_LEDS):
-            previousPixel = 59 if (i == 0) else i - 1
+            previousPixel = self.NUM_LEDS - 1 if (i == 0) else i - 1
             self.pixels_set(previousPixel, self.BLACK)
             self.pixels_set(i, color)
             time.sleep(wait)
             self.pixels_show()
             
     """
-    Tick the clock by changing the color of the pixel corresponding to the current second.
+    Tick the clock by changing the color of the pixels corresponding to the current second.
 
     Args:
         color (tuple): A tuple of three integers representing the RGB color values.
@@ -328,8 +559,12 @@ class NeoPixelRing(object):
         None
     """            
     def tick(self, color, sec):     
-        pixel = sec 
-        self.pixels_set(pixel, color)
+        if self.renderer:
+            self.renderer.tick(self.pack(color), sec)
+            return
+            
+        for pixel in range(self.secondPixel[sec], self.secondPixel[sec + 1]):
+            self.pixels_set(pixel, color)
         self.pixels_show()     
      
     """
@@ -342,13 +577,40 @@ class NeoPixelRing(object):
         None
     """     
     def rainbow_cycle(self, wait):
+        if self.renderer:
+            # Let a running animation finish rather than restarting it every pass
+            if not self.renderer.busy():
+                self.renderer.rainbow()
+            return
+            
+        ar = self.ar
+        wheelTable = self.wheelTable
         for j in range(255):
             for i in range(self.NUM_LEDS):
                 rc_index = (i * 256 // self.NUM_LEDS) + j
-                self.pixels_set(i, self.wheel(rc_index & 255))
+                ar[i] = wheelTable[rc_index & 255]
             self.pixels_show()
             time.sleep(wait)
          
+    """
+    Show or hide the markers at 0, 15, 30 and 45 seconds. With the renderer the
+    markers sit on their own layer above the seconds and animations.
+
+    Args:
+        color (tuple): A tuple of three integers representing the RGB color values, BLACK hides the markers.
+
+    Returns:
+        None
+    """
+    def setMarkers(self, color):
+        if self.renderer:
+            self.renderer.markers(self.pack(color))
+            return
+            
+        for sec in RingRenderer.MARKER_SECONDS:
+            self.pixels_set(self.secondPixel[sec], color)
+        self.pixels_show()
+
     """
     Get the next color from the predefined list of colors.
 
@@ -375,7 +637,7 @@ Methods:
     setHour(hour): Set the hour of the clock.
     setMinute(minute): Set the minute of the clock.
     setSecond(second): Set the second of the clock.
-    getDateTime(): Get the current date and time from the clock.
+    getDateTime(): Get the current date and time from the clock, in a list reused on every call.
 """
 class Clock(object):
 
@@ -383,9 +645,9 @@ class Clock(object):
     
         # Initialize DS1302 RTC with specific GPIO pins
         self.ds = ds1302.DS1302(Pin(5), Pin(18), Pin(19))  # (clk, dio, cs)
-
-        # Get current datetime from DS1302
-        self.ds.date_time()
+        
+        # Refilled on every read so that reading the time allocates nothing
+        self.datetime = [0, 0, 0, 0, 0, 0, 0]
 
         # Set DS1302 datetime to 2024-01-01 Monday 00:00:00
         #self.ds.date_time([2024, 12, 19, 4, 10, 34, 00])  # (year,month,day,weekday,hour,minute,second)
@@ -401,21 +663,165 @@ class Clock(object):
 
     def getDateTime(self):    
 
-        datetime = self.ds.date_time()
+        # Read each register into the same list, date_time() would build a new one
+        ds = self.ds
+        datetime = self.datetime
+        datetime[0] = ds.year()
+        datetime[1] = ds.month()
+        datetime[2] = ds.day()
+        datetime[3] = ds.weekday()
+        datetime[4] = ds.hour()
+        datetime[5] = ds.minute()
+        datetime[6] = ds.second()
         return datetime    
 
+    """
+    Set the hour and minute in a single RTC write, keeping the date and second.
+
+    Args:
+        hour (int): The hour.
+        minute (int): The minute.
+
+    Returns:
+        None
+    """
+    def setHourMinute(self, hour, minute):
+        datetime = self.ds.date_time()
+        datetime[4] = hour
+        datetime[5] = minute
+        self.ds.date_time(datetime)
+
+##############################
+"""
+PageTransport - page by page I2C transport for the SSD1306.
+
+At start-up each I2C frequency in FREQUENCIES is tried, fastest first, and the
+first one at which the display acknowledges every byte of PROBE_TRIALS test
+commands is kept. The SSD1306 is rated for Fast-mode, 400 kHz, at most; a probe
+can only check ACKs, so a faster bus could pass it and still corrupt data, and
+no faster frequency is tried. A refresh sets the full-screen window once, then
+sends each 128 byte page as a single transaction: writevto sends the data
+control byte and a memoryview of the page straight from the framebuffer, with no
+copy. The time taken by each page is kept for report.
+
+Attributes:
+    FREQUENCIES (tuple): I2C frequencies tried at start-up, fastest first.
+    i2c (I2C): The I2C bus at the negotiated frequency.
+    freq (int): The negotiated frequency.
+    pageUs (array.array): Time taken by the last transfer of each page, in us.
+
+Methods:
+    show(buffer): Send the framebuffer.
+    report(): Print the frequency and page transfer times.
+"""
+class PageTransport(object):
+
+    ADDRESS = 0x3C
+    FREQUENCIES = (400_000, 100_000)
+    PROBE_TRIALS = 8
+    PAGES = 8
+    WIDTH = 128
+    
+    # Command control byte followed by a NOP
+    PROBE = b"\x00\xe3"
+    
+    # Command control byte, column address 0 to 127, page address 0 to 7
+    WINDOW = b"\x00\x21\x00\x7f\x22\x00\x07"
+    
+    # Data control byte sent ahead of each page
+    DATA = b"\x40"
+
+    def __init__(self, bus, sdaPin, sclPin):
+        self.i2c = None
+        self.freq = 0
+        for freq in self.FREQUENCIES:
+            i2c = I2C(bus, sda=Pin(sdaPin), scl=Pin(sclPin), freq=freq)
+            if self.probe(i2c):
+                self.i2c = i2c
+                self.freq = freq
+                break
+        
+        if (self.i2c is None):
+            # Nothing answered, carry on at the slowest frequency
+            self.i2c = i2c
+            self.freq = freq
+            print("SSD1306 did not answer the I2C probe")
+        
+        self.pageUs = array.array("H", [0 for _ in range(self.PAGES)])
+        self.vectors = None
+
+    """
+    Private
+
+    Check that the display acknowledges every byte of a few test commands.
+
+    Returns:
+        bool: True if every command was acknowledged.
+    """
+    def probe(self, i2c):
+        try:
+            for i in range(self.PROBE_TRIALS):
+                if (i2c.writeto(self.ADDRESS, self.PROBE) != len(self.PROBE)):
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def show(self, buffer):
+        if (self.vectors is None):
+            # The control byte and a view of each page, made once for the framebuffer
+            pages = memoryview(buffer)
+            self.vectors = tuple((self.DATA, pages[p * self.WIDTH : (p + 1) * self.WIDTH]) for p in range(self.PAGES))
+        
+        i2c = self.i2c
+        pageUs = self.pageUs
+        i2c.writeto(self.ADDRESS, self.WINDOW)
+        for page in range(self.PAGES):
+            start = time.ticks_us()
+            i2c.writevto(self.ADDRESS, self.vectors[page])
+            pageUs[page] = time.ticks_diff(time.ticks_us(), start)
+
+    def report(self):
+        total = 0
+        slowest = 0
+        for us in self.pageUs:
+            total = total + us
+            slowest = max(slowest, us)
+        print("OLED I2C:", self.freq, "Hz, page transfer", total // self.PAGES, "us average,", slowest, "us slowest")
+
 ##############################
     
 class OledDisplay(object):
 
+    # Character width of the built-in font, in pixels
+    CHAR_WIDTH = 8
+    
+    # x position of a value following a six character label such as 'Date: '
+    VALUE_X = 48
+
+    # Shown in place of the temperature and humidity until the sensor has been read
+    NO_READING = '--'
+    
+    # Preformatted numbers, so that a refresh draws constant strings and allocates nothing
+    TWO_DIGITS = tuple("{:0>2}".format(n) for n in range(100))
+    NUMBERS = tuple(str(n) for n in range(101))
+    
+    # Contrast for each PhotoResistor brightness step, darkest room first
+    STEP_CONTRASTS = (16, 64, 160, 255)
+
     def __init__(self): 
-        #====== setup the I2C communication
-        i2c = I2C(0, sda=Pin(20), scl=Pin(21))
+        #====== setup the I2C communication at the fastest frequency the display handles
+        self.transport = PageTransport(0, 20, 21)
 
         # Set up the OLED display (128x64 pixels) on the I2C bus
         # SSD1306_I2C is a subclass of FrameBuffer. FrameBuffer provides support for graphics primitives.
+        # Refreshes go through the transport rather than SSD1306_I2C.show.
         # http://docs.micropython.org/en/latest/pyboard/library/framebuf.html
-        self.oled = ssd1306.SSD1306_I2C(128, 64, i2c)
+        self.oled = ssd1306.SSD1306_I2C(128, 64, self.transport.i2c)
+        
+        # The year only changes once a year, so its text is cached
+        self.year = None
+        self.yearText = ""
 
     """
     Clear the display by filling it with white
@@ -429,9 +835,21 @@ class OledDisplay(object):
     def oledClearWhite(self):
         # Clear the display by filling it with white and then showing the update
         self.oled.fill(1)
-        self.oled.show()
+        self.transport.show(self.oled.buffer)
         time.sleep(1)  # Wait for 1 second
 
+    """
+    Set the display contrast.
+
+    Args:
+        level (int): The contrast, from 0 to 255.
+
+    Returns:
+        None
+    """
+    def setContrast(self, level):
+        self.oled.contrast(level)
+
     """
     Clear the display by filling it with black
 
@@ -444,7 +862,7 @@ class OledDisplay(object):
     def oledClearBlack(self):
         # Clear the display again by filling it with black
         self.oled.fill(0)
-        self.oled.show()
+        self.transport.show(self.oled.buffer)
 
     """
     Display date and time on the OLED screen.
@@ -456,42 +874,153 @@ class OledDisplay(object):
         hour (int): The hour.
         minute (int): The minute.
         sec (int): The second.
+        reading (list): [temperature, humidity], or None to show placeholders.
 
     Returns:
         None
     """
 
-    def show(self, year, month, day, hour, minute, sec, sensor):
+    def show(self, year, month, day, hour, minute, sec, reading):
         
-        showDate = "{:0>2}/{:0>2}/{:0>2}".format(day,month,year)
-        showTime = "{:0>2}:{:0>2}:{:0>2}".format(hour,minute,sec)
+        if (year != self.year):
+            self.year = year
+            self.yearText = "{:0>2}".format(year)
+               
+        # clear the framebuffer, the display is refreshed once below
+        self.oled.fill(0)
+
+        # Display text on the OLED screen, one constant string per field
+        x = self.VALUE_X
+        w = self.CHAR_WIDTH
+        digits = self.TWO_DIGITS
         
-        print("Time: " + showTime)
+        self.oled.text('Date: ', 0, 0)
+        self.oled.text(digits[day], x, 0)
+        self.oled.text('/', x + 2 * w, 0)
+        self.oled.text(digits[month], x + 3 * w, 0)
+        self.oled.text('/', x + 5 * w, 0)
+        self.oled.text(self.yearText, x + 6 * w, 0)
         
-        d = sensor.read()
-               
-        # clear 
-        self.oledClearBlack()
+        self.oled.text('Time: ', 0, 16)
+        self.oled.text(digits[hour], x, 16)
+        self.oled.text(':', x + 2 * w, 16)
+        self.oled.text(digits[minute], x + 3 * w, 16)
+        self.oled.text(':', x + 5 * w, 16)
+        self.oled.text(digits[sec], x + 6 * w, 16)
+        
+        self.oled.text('Temp: ', 0, 32)
+        self.oled.text('Humidity: ', 0, 48)
+        if (reading is None):
+            self.oled.text(self.NO_READING, x, 32)
+            self.oled.text(self.NO_READING, x + 4 * w, 48)
+        else:
+            self.textValue(reading[0], " C", x, 32)
+            self.textValue(reading[1], "%", x + 4 * w, 48)
+        
+        self.transport.show(self.oled.buffer)
 
-        # Display text on the OLED screen
-        self.oled.text('Date: ' + showDate, 0, 0)   
-        self.oled.text('Time: ' + showTime, 0, 16)
-        self.oled.text('Temp: ' + str(d[0]) + " C", 0, 32)         
-        self.oled.text('Humidity: ' + str(d[1]) + "%", 0, 48)
+    """
+    Display the hour and minute being set.
+
+    Args:
+        hour (int): The hour being set.
+        minute (int): The minute being set.
+
+    Returns:
+        None
+    """
+    def showSetting(self, hour, minute):
+        self.oled.fill(0)
+        self.oled.text('Set time', 0, 0)
+        self.oled.text(self.TWO_DIGITS[hour], self.VALUE_X, 16)
+        self.oled.text(':', self.VALUE_X + 2 * self.CHAR_WIDTH, 16)
+        self.oled.text(self.TWO_DIGITS[minute], self.VALUE_X + 3 * self.CHAR_WIDTH, 16)
+        self.transport.show(self.oled.buffer)
+
+    """
+    Display the 24 hour minimum, average and maximum temperature and humidity,
+    with a sparkline of each.
+
+    Args:
+        history (SensorHistory): The rolling sensor history.
+
+    Returns:
+        None
+    """
+    def showHistory(self, history):
+        self.oled.fill(0)
         
-        self.oled.show()
+        self.showStats('T', history.temperature, "C", 0)
+        self.showStats('H', history.humidity, "%", 8)
+        
+        history.temperature.drawSparkline(self.oled, 0, 16, 128, 24)
+        history.humidity.drawSparkline(self.oled, 0, 40, 128, 24)
+        
+        self.transport.show(self.oled.buffer)
+
+    """
+    Draw a line of minimum, average and maximum.
+
+    Args:
+        label (str): Single character label.
+        series (RollingSeries): The series to summarise.
+        unit (str): The unit drawn at the end of the line.
+        y (int): The y position of the line.
+
+    Returns:
+        None
+    """
+    def showStats(self, label, series, unit, y):
+        self.oled.text(label, 0, y)
+        self.textValue(series.min(), "", 16, y)
+        self.textValue(series.average(), "", 48, y)
+        self.textValue(series.max(), unit, 80, y)
+
+    """
+    Draw a number followed by its unit.
+
+    Args:
+        value (int): The number to draw.
+        unit (str): The unit drawn after the number.
+        x (int): The x position of the number.
+        y (int): The y position of the number.
+
+    Returns:
+        None
+    """
+    def textValue(self, value, unit, x, y):
+        if (0 <= value < len(self.NUMBERS)):
+            text = self.NUMBERS[value]
+        else:
+            text = str(value)
+            
+        self.oled.text(text, x, y)
+        self.oled.text(unit, x + len(text) * self.CHAR_WIDTH, y)
 
 ##############################
     
 class ServoMotor(object):
 
+    SERVO_PIN = 16
+
     def __init__(self): 
-        # Initialize PWM on pin 16 for servo control
-        self.servo = machine.PWM(machine.Pin(16))
-        self.servo.freq(50)  # Set PWM frequency to 50Hz, common for servo motors
+        # The servo PWM is initialized on first use, keeping it off the boot path
+        self.servo = None
+
+    """
+    Initialize the servo PWM if it has not been initialized yet.
 
+    Returns:
+        None
     """
-    Maps a value from one range to another.
+    def init(self):
+        if (self.servo is None):
+            # Initialize PWM on pin 16 for servo control
+            self.servo = PWM(Pin(self.SERVO_PIN))
+            self.servo.freq(50)  # Set PWM frequency to 50Hz, common for servo motors
+
+    """
+    Maps a value from one range to another in integer maths, rounding down.
     This function is useful for converting servo angle to pulse width.
 
     Args:
@@ -505,7 +1034,7 @@ class ServoMotor(object):
         int: The mapped value.
     """
     def interval_mapping(self, x, in_min, in_max, out_min, out_max):
-        return (x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min
+        return intervalMap(x, in_min, in_max, out_min, out_max)
 
     """
     Moves the servo to a specific angle.
@@ -518,12 +1047,8 @@ class ServoMotor(object):
         None
     """    
     def servo_write(self, angle):
-        pulse_width = self.interval_mapping(
-            angle, 0, 180, 0.5, 2.5
-        )  # Map angle to pulse width in ms
-        duty = int(
-            self.interval_mapping(pulse_width, 0, 20, 0, 65535)
-        )  # Map pulse width to duty cycle
+        # Map angle to a 0.5 ms to 2.5 ms pulse, as a duty cycle, in fixed point
+        duty = servoDuty(angle)
         self.servo.duty_u16(duty)  # Set PWM duty cycle
 
     """
@@ -538,6 +1063,8 @@ class ServoMotor(object):
     def chime(self, volume):
         
         if (volume > 0):
+            
+            self.init()
                     
             if (volume == 1):
                 swingSpeed = 50
@@ -592,16 +1119,88 @@ class Button(object):
         self.button = Pin(pinNumber, Pin.IN)
 
 
+"""
+Candle LED that can be steady or flicker, driven by PIO in both cases.
+
+A PIO state machine plays a preloaded pattern fed by DMA, see flicker.py, so
+the candle costs no CPU. Each brightness step has a flicker pattern and a
+steady one, generated the first time the candle is lit; switching between them
+restarts the state machine so the change shows at once. Off stops the state
+machine and drives the pin low.
+
+The candles do not use the hardware PWM. A PWM slice drives GPIO 2n and 2n + 1
+and its channels A and B are shared by every pin that maps to them, so GPIO 22
+(slice 3 A) would share its output with the LightStar green on GPIO 6 (slice 3
+A) and its slice with the blue on GPIO 7 (slice 3 B). The left candle, GPIO 27,
+runs on PIO1 state machine 0 and the right, GPIO 22, on state machine 1.
+
+Attributes:
+    STEP_DUTIES (tuple): Duty for each PhotoResistor brightness step, darkest room first.
+    step (int): The current brightness step.
+    flickerOutput (FlickerOutput): PIO and DMA output, or None until the candle is first lit.
+
+Methods:
+    on(): Light steadily.
+    off(): Switch off.
+    flicker(): Flicker like a candle.
+    setStep(step): Follow a brightness step.
+"""
 class Candle(object):
     
-    def __init__(self, pin):   
-        self.led = Pin(pin, Pin.OUT)
+    STEP_DUTIES = (8192, 16384, 32768, 65535)
+    
+    def __init__(self, pin, smId):   
+        self.pin = pin
+        self.smId = smId
+        Pin(pin, Pin.OUT, value=0)
+        self.step = len(self.STEP_DUTIES) - 1
+        self.lit = False
+        self.flickering = False
+        self.flickerOutput = None
         
     def on(self):
-        self.led.value(1)
+        if not self.lit or self.flickering:
+            self.flickering = False
+            self.play()
         
     def off(self):
-        self.led.value(0)
+        if self.lit:
+            self.flickerOutput.stop()
+            Pin(self.pin, Pin.OUT, value=0)
+            self.lit = False
+            self.flickering = False
+        
+    def flicker(self):
+        if not self.flickering:
+            self.flickering = True
+            self.play()
+        
+    """
+    Private
+    
+    Play the pattern for the current step and mode from its start.
+
+    Returns:
+        None
+    """
+    def play(self):
+        if (self.flickerOutput is None):
+            # Flicker patterns first, then steady ones. The pin seeds the
+            # flicker, so the two candles flicker differently
+            patterns = tuple(flickerPattern(PATTERN_LENGTH, self.pin, (duty + 1) >> 8) for duty in self.STEP_DUTIES)
+            patterns = patterns + tuple(steadyPattern(PATTERN_LENGTH, duty >> 8) for duty in self.STEP_DUTIES)
+            self.flickerOutput = FlickerOutput(self.pin, self.smId, patterns)
+        
+        self.flickerOutput.stop()
+        self.flickerOutput.setPattern(self.step if self.flickering else len(self.STEP_DUTIES) + self.step)
+        self.flickerOutput.start()
+        self.lit = True
+        
+    def setStep(self, step):
+        if (step != self.step):
+            self.step = step
+            if self.lit:
+                self.play()
         
            
 """
@@ -622,20 +1221,33 @@ class VolumeButton(Button):
         
         super().__init__(pinNumber)
         
-        # Initialize the onboard LED of the Raspberry Pi Pico W
-        self.led = Pin('LED', Pin.OUT)
+        # The LEDs are initialized on the first press, keeping them off the boot path
+        self.led = None
 
-        # Initialize the onboard LED of the Raspberry Pi Pico W
-        self.led1 = Pin(8, Pin.OUT)
-        self.led2 = Pin(9, Pin.OUT)
-        self.led3 = Pin(10, Pin.OUT)
-        self.led4 = Pin(11, Pin.OUT)
+    """
+    Initialize the volume LEDs if they have not been initialized yet.
+
+    Returns:
+        None
+    """
+    def initLeds(self):
+        if (self.led is None):
+            # Initialize the onboard LED of the Raspberry Pi Pico W
+            self.led = Pin('LED', Pin.OUT)
+
+            # Initialize the onboard LED of the Raspberry Pi Pico W
+            self.led1 = Pin(8, Pin.OUT)
+            self.led2 = Pin(9, Pin.OUT)
+            self.led3 = Pin(10, Pin.OUT)
+            self.led4 = Pin(11, Pin.OUT)
 
     def volume(self, volume, servo):
         
         MAX_VOLUME = 4
         
         if self.button.value() == 1:  # Check if the button is pressed
+            self.initLeds()
+            
             volume = volume + 1
             
             if (volume > MAX_VOLUME):
@@ -680,53 +1292,141 @@ class VolumeButton(Button):
         
         return volume
 
+"""
+Auto-repeat for a held button.
+
+A press steps once straight away. Held for REPEAT_DELAY_MS it starts repeating,
+and the repeats speed up through REPEAT_INTERVALS_MS, staying at the last interval.
+
+Methods:
+    update(pressed, now): Whether to step now.
+"""
+class AutoRepeat(object):
+
+    REPEAT_DELAY_MS = 500
+    REPEAT_INTERVALS_MS = (250, 250, 150, 150, 100, 100, 100, 50)
+
+    def __init__(self):
+        self.nextMs = None
+        self.count = 0
+
+    def update(self, pressed, now):
+        if not pressed:
+            self.nextMs = None
+            self.count = 0
+            return False
+            
+        if (self.nextMs is None):
+            self.nextMs = time.ticks_add(now, self.REPEAT_DELAY_MS)
+            return True
+            
+        if (time.ticks_diff(now, self.nextMs) >= 0):
+            i = min(self.count, len(self.REPEAT_INTERVALS_MS) - 1)
+            self.nextMs = time.ticks_add(now, self.REPEAT_INTERVALS_MS[i])
+            self.count = self.count + 1
+            return True
+            
+        return False
+
 """
 HourButton class inherits from Button class.
 
 Methods:
-    incrementHour(clock, hour): Increments the hour by 1 if the button is pressed.
+    incrementHour(hour, now): Increments the hour by 1 if the button is pressed, auto-repeating while it is held.
 
 Args:
-    clock (Clock): Clock object that holds the current hour.
     hour (int): Current hour value.
+    now (int): Current time in ms, from time.ticks_ms.
 
 Returns:
-    None
+    int: The new hour value.
 """  
 class HourButton(Button):
 
-    def incrementHour(self, clock, hour):
-        if self.button.value() == 1:  # Check if the button is pressed    
+    def __init__(self, pinNumber):
+        super().__init__(pinNumber)
+        self.repeat = AutoRepeat()
+
+    def incrementHour(self, hour, now):
+        if self.repeat.update(self.button.value() == 1, now):  # Check if the button is pressed    
             hour = hour + 1
             
             if hour == 24:
                 hour = 0
                 
-            clock.setHour(hour)
+        return hour
 
 """
 MinuteButton class inherits from Button class.
 
 Methods:
-    incrementMinute(clock, hour): Increments the minute by 1 if the button is pressed.
+    incrementMinute(minute, now): Increments the minute by 1 if the button is pressed, auto-repeating while it is held.
 
 Args:
-    clock (Clock): Clock object that holds the current minute.
-    hour (int): Current minute value.
+    minute (int): Current minute value.
+    now (int): Current time in ms, from time.ticks_ms.
 
 Returns:
-    None
+    int: The new minute value.
 """             
 class MinuteButton(Button):
 
-    def incrementMinute(self, clock, minute):
-        if self.button.value() == 1:  # Check if the button is pressed    
+    def __init__(self, pinNumber):
+        super().__init__(pinNumber)
+        self.repeat = AutoRepeat()
+
+    def incrementMinute(self, minute, now):
+        if self.repeat.update(self.button.value() == 1, now):  # Check if the button is pressed    
             minute = minute + 1
             
             if minute == 60:
                 minute = 0
                 
-            clock.setMinute(minute)
+        return minute
+
+"""
+Time-setting mode.
+
+While the hour or minute button is held the edits are buffered in RAM and shown
+on the OLED straight away. Once neither button has been pressed for
+COMMIT_DELAY_MS the new time is written to the RTC in one transaction.
+
+Methods:
+    pressed(): Whether the hour or minute button is pressed.
+    run(clock, display, hour, minute): Run the setting mode until the edit is committed.
+"""
+class TimeSetter(object):
+
+    COMMIT_DELAY_MS = 1500
+    POLL_MS = 20
+
+    def __init__(self, hourButton, minuteButton):
+        self.hourButton = hourButton
+        self.minuteButton = minuteButton
+
+    def pressed(self):
+        return self.hourButton.button.value() == 1 or self.minuteButton.button.value() == 1
+
+    def run(self, clock, display, hour, minute):
+        lastPress = time.ticks_ms()
+        
+        while time.ticks_diff(time.ticks_ms(), lastPress) < self.COMMIT_DELAY_MS:
+            now = time.ticks_ms()
+            newHour = self.hourButton.incrementHour(hour, now)
+            newMinute = self.minuteButton.incrementMinute(minute, now)
+            
+            if (newHour != hour or newMinute != minute):
+                hour = newHour
+                minute = newMinute
+                display.showSetting(hour, minute)
+                
+            if self.pressed():
+                lastPress = now
+                
+            time.sleep_ms(self.POLL_MS)
+            
+        print("Time set:", hour, minute)
+        clock.setHourMinute(hour, minute)
 
 """
 SecondButton class inherits from Button class.
@@ -746,53 +1446,253 @@ class SecondButton(Button):
         if self.button.value() == 1:  # Check if the button is pressed               
             clock.setSecond(0)
 
-def paintSeconds(minute, sec, neoPixel, color):
+##############################
+
+"""
+Switch between the active and idle modes, and sleep the CPU between passes.
+
+In active mode the loop runs every LOOP_SLEEP_MS. In idle mode the OLED is
+dimmed, the ring renderer on core 1 is stopped once it has shown the last frame,
+and the CPU lightsleeps until the next minute, or until a button interrupt wakes
+it. The renderer is started again on leaving idle mode. Wakeups and active CPU
+time are counted and reported every hour; powersim.py reports the same for a
+simulated day on the host.
+
+Attributes:
+    idle (bool): Whether the clock is idling.
+    activeContrast (int): OLED contrast used while active.
+    renderer (RingRenderer): The ring renderer, stopped while idle.
+    wakeups (int): Number of wakeups since the last report.
+    buttonWakeups (int): Number of button interrupts since the last report.
+    activeMs (int): CPU time spent running passes since the last report, in ms.
+
+Methods:
+    setIdle(idle, display): Enter or leave idle mode.
+    setActiveContrast(contrast, display): Change the OLED contrast used while active.
+    sleep(sec): Sleep until the next pass is needed.
+    report(hour): Print the wakeups and active CPU time once an hour.
+"""
+class PowerManager(object):
+
+    IDLE_CONTRAST = 1
+    ACTIVE_CONTRAST = 255
+
+    def __init__(self, buttons, renderer):
+        self.idle = False
+        self.activeContrast = self.ACTIVE_CONTRAST
+        self.renderer = renderer
+        self.wakeups = 0
+        self.buttonWakeups = 0
+        self.activeMs = 0
+        self.reportHour = None
+        self.passStart = time.ticks_ms()
+        
+        # Any button press wakes the CPU from lightsleep
+        for b in buttons:
+            b.button.irq(trigger=Pin.IRQ_RISING, handler=self.wake)
+
+    def wake(self, pin):
+        self.buttonWakeups = self.buttonWakeups + 1
+
+    def setIdle(self, idle, display):
+        if (idle != self.idle):
+            self.idle = idle
+            display.setContrast(self.IDLE_CONTRAST if idle else self.activeContrast)
+            
+            if not idle and not self.renderer.running:
+                self.renderer.start()
+
+    def setActiveContrast(self, contrast, display):
+        if (contrast != self.activeContrast):
+            self.activeContrast = contrast
+            if not self.idle:
+                display.setContrast(contrast)
+
+    def sleep(self, sec):
+        self.activeMs = self.activeMs + time.ticks_diff(time.ticks_ms(), self.passStart)
+        
+        if (self.idle):
+            # Core 1 must not keep waking every frame, it stops after showing this pass's commands
+            if self.renderer.running:
+                self.renderer.stop()
+            
+            # Sleep until just after the next minute, a button interrupt wakes us sooner
+            lightsleep((60 - sec) * 1000)
+        else:
+            time.sleep_ms(LOOP_SLEEP_MS)
+            
+        self.wakeups = self.wakeups + 1
+        self.passStart = time.ticks_ms()
+
+    def report(self, hour):
+        if (hour != self.reportHour):
+            if (self.reportHour is not None):
+                print("Wakeups in the last hour:", self.wakeups, "of which button presses:", self.buttonWakeups)
+                print("Active CPU time in the last hour:", self.activeMs, "ms")
+            self.reportHour = hour
+            self.wakeups = 0
+            self.buttonWakeups = 0
+            self.activeMs = 0
+
+##############################
+
+"""
+Record how long each stage of the boot sequence takes.
+
+Methods:
+    mark(stage): Record the time taken since the previous mark.
+    report(): Print the boot-time breakdown.
+"""
+class BootTimer(object):
+
+    def __init__(self):
+        self.start = time.ticks_ms()
+        self.last = self.start
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.ticks_ms()
+        self.stages.append((stage, time.ticks_diff(now, self.last)))
+        self.last = now
+
+    def elapsed(self):
+        return time.ticks_diff(self.last, self.start)
+
+    def report(self):
+        print("Boot time breakdown:")
+        for stage, ms in self.stages:
+            print("  " + stage + ": " + str(ms) + " ms")
+        print("  total: " + str(self.elapsed()) + " ms")
+
+def paintSeconds(actions, sec, neoPixel, color):
 
     if (sec == 0):
         color = neoPixel.getNextColor()
         
-    if (minute == 59 and sec < 45):
+    if (actions & Schedule.RAINBOW and sec < RAINBOW_SECONDS):
         neoPixel.rainbow_cycle(0)      
-    elif (minute in [14, 29, 44]):
+    elif (actions & Schedule.CHASE):
         neoPixel.color_chase(color, 0)
       
     neoPixel.tick(color, sec)
    
     return color
+
+# Light the minutes of the hour so far, repainting on the hour or when the minutes go back
+def paintMinutes(minute, minuteRing, paintedMinute):
+    if (minute == paintedMinute):
+        return minute
+    
+    first = 0 if (paintedMinute is None or minute < paintedMinute) else paintedMinute + 1
+    if (first == 0):
+        minuteRing.pixels_fill(NeoPixelRing.BLACK)
+    for m in range(first, minute + 1):
+        minuteRing.tick(NeoPixelRing.MINUTE_COLOR, m)
+    
+    return minute
+
+# Switch every light to a brightness step, each only swaps in a precomputed table or value
+def setBrightnessStep(step, rings, lightStar, candles, display, power):
+    for ring in rings:
+        ring.setStep(step)
+    lightStar.setStep(step)
+    for candle in candles:
+        candle.setStep(step)
+    power.setActiveContrast(OledDisplay.STEP_CONTRASTS[step], display)
     
 # Continuously display current datetime every second and chime hourly
 def main():
     
-    lightStar = LightStar()
+    boot = BootTimer()
 
+    # Bring up the RTC and OLED first so the time is shown as early as possible
     clock = Clock()
+    boot.mark("rtc")
+    
+    display = OledDisplay()
+    boot.mark("oled")
+    
+    # The first frame does not wait for the DHT11, which is not ready this soon after power-up
+    datetime = clock.getDateTime()
+    display.show(datetime[0], datetime[1], datetime[2], datetime[4], datetime[5], datetime[6], None)
+    boot.mark("first display")
     
     sensor = TemperatureHumiditySensor()
+    display.transport.report()
     
-    photoResistor = PhotoResistor()
-
-    candleLeft = Candle(27)
-    candleRight = Candle(22)
+    settings = SettingsStore(SETTINGS_PREFIX, SETTINGS_NAMES, SETTINGS_DEFAULTS, SETTINGS_URGENT)
+    boot.mark("settings")
     
-    display = OledDisplay()
-
-    display.oledClearWhite()
-    display.oledClearBlack()
-
-    servoMotor = ServoMotor()
-
+    # The remaining subsystems are not needed to show the time
     neoPixel = NeoPixelRing()
 
     neoPixel.pixels_fill(NeoPixelRing.BLACK)
+    
+    minuteRing = None
+    rings = (neoPixel,)
+    if MINUTE_RING:
+        minuteRing = NeoPixelRing(*MINUTE_RING)
+        minuteRing.pixels_fill(NeoPixelRing.BLACK)
+        rings = (neoPixel, minuteRing)
+    
+    # Animations now run on core 1 and no longer block the display, buttons and chime
+    neoPixel.startRenderer(rings[1:])
 
-    color = neoPixel.getNextColor()
+    # Carry on with the ring color in use at power off
+    neoPixel.colorIndex = settings.get("colorIndex") % NeoPixelRing.NUMBER_OF_COLORS
+    color = NeoPixelRing.COLORS[neoPixel.colorIndex]
+    boot.mark("neopixel")
+    
+    # The star fades between colours from a timer interrupt
+    lightStar = LightStar()
+    lightStar.startFader()
+    
+    photoResistor = PhotoResistor()
+
+    # The candles flicker from PIO1, leaving PIO0 to the ring
+    candleLeft = Candle(27, 4)
+    candleRight = Candle(22, 5)
+    candles = (candleLeft, candleRight)
+
+    # Initialized lazily on the first chime
+    servoMotor = ServoMotor()
 
     button1 = VolumeButton(17)
     button2 = HourButton(15)
     button3 = MinuteButton(12)
     button4 = SecondButton(13)
+    
+    timeSetter = TimeSetter(button2, button3)
+    
+    power = PowerManager((button1, button2, button3, button4), neoPixel.renderer)
+    
+    sensorLog = SensorLog(SENSOR_LOG_PATH)
+    
+    history = SensorHistory()
+    boot.mark("star, candles and buttons")
 
-    volume = 4
+    boot.report()
+
+    volume = settings.get("volume")
+    
+    # Whether the candles, ring and star were last switched on, None until first set
+    lightsOn = None
+    
+    # Brightness step last applied, None until first set
+    brightness = None
+    
+    # Minute last drawn on the OLED, and minute of the day last chimed
+    shownMinute = None
+    chimedMinute = None
+    loggedMinute = None
+    
+    # Last minute lit on the minute ring, None while it is off
+    paintedMinute = None
+    
+    schedule = Schedule(CLOCK_RULES)
+
+    # Start the loop with a clean heap
+    gc.collect()
 
     while True:
         
@@ -806,36 +1706,87 @@ def main():
         minute = datetime[5]
         sec = datetime[6]
         
-        display.show(year, month, day, hour, minute, sec, sensor)
+        actions = schedule.actions(hour, minute)
         
-        if (hour in [9,10,11,12,13,14,15,16,17,18,19,20,21,22]):
-            
-            if (photoResistor.isDark()):
-                candleRight.on()
-                candleLeft.on()                
-                color = paintSeconds(minute, sec, neoPixel, color)
-                lightStar.illuminate(hour)
+        reading = sensor.read()
+        
+        # After an idle sleep the light filter is settled on the current light at once
+        samples = PhotoResistor.SETTLE_SAMPLES if power.idle else 1
+        dark = (actions & Schedule.ACTIVE) != 0 and photoResistor.isDark(samples)
+        
+        # Idle at night, and in daylight when the lights are off
+        power.setIdle(not dark, display)
+        
+        # Follow the room brightness while the lights are on
+        if (dark):
+            step = photoResistor.brightnessStep()
+            if (step != brightness):
+                brightness = step
+                setBrightnessStep(step, rings, lightStar, candles, display, power)
+        
+        # When idle the OLED is only redrawn once a minute
+        if (not power.idle and sec >= HISTORY_FIRST_SECOND):
+            display.showHistory(history)
+        elif (not power.idle or minute != shownMinute):
+            display.show(year, month, day, hour, minute, sec, reading)
+            shownMinute = minute
+        
+        # Switch the scene only on a real transition
+        if (dark != lightsOn):
+            lightsOn = dark
+            if (dark):
+                candleRight.flicker()
+                candleLeft.flicker()
+                neoPixel.setMarkers(NeoPixelRing.MARKER_COLOR)
             else:
                 candleRight.off()
                 candleLeft.off()
+                neoPixel.setMarkers(NeoPixelRing.BLACK)
                 neoPixel.pixels_fill(NeoPixelRing.BLACK)
+                if minuteRing:
+                    minuteRing.pixels_fill(NeoPixelRing.BLACK)
+                    paintedMinute = None
                 lightStar.off()
+        
+        if (dark):
+            color = paintSeconds(actions, sec, neoPixel, color)
+            if minuteRing:
+                paintedMinute = paintMinutes(minute, minuteRing, paintedMinute)
+            lightStar.illuminate(hour)
+            
+        # Chime once in each chime minute, even when waking late from idle. A
+        # minute without a chime clears the last one, so the same minute chimes
+        # again the next day
+        if not (actions & Schedule.CHIME):
+            chimedMinute = None
+        elif (hour * 60 + minute != chimedMinute):
+            chimedMinute = hour * 60 + minute
+            servoMotor.hourlyChime(schedule.strikeCount(hour, minute), volume)
                 
-            if (minute == 0 and sec == 0):
-                servoMotor.hourlyChime(1, volume)
-                    
-                neoPixel.pixels_fill(NeoPixelRing.BLACK)
-        else:
             neoPixel.pixels_fill(NeoPixelRing.BLACK)
-            candleRight.off()
-            candleLeft.off() 
             
         volume = button1.volume(volume, servoMotor)
-        button2.incrementHour(clock, hour)
-        button3.incrementMinute(clock, minute)
+        if timeSetter.pressed():
+            timeSetter.run(clock, display, hour, minute)
         button4.zeroSecond(clock)
         
-        time.sleep(0.5)
+        # Log the sensors once a minute, the log only writes to flash once a page is full
+        if (reading is not None and minute != loggedMinute):
+            loggedMinute = minute
+            sensorLog.append(minuteStamp(year, month, day, hour, minute), reading[0], reading[1], photoResistor.sample())
+            history.add(reading[0], reading[1])
+        
+        # Settings are only written to flash once they have stopped changing
+        settings.set("volume", volume)
+        settings.set("colorIndex", neoPixel.colorIndex)
+        settings.poll()
+        
+        power.report(hour)
+        
+        # Collect garbage while idle rather than mid-animation
+        gc.collect()
+        
+        power.sleep(sec)
     
 if __name__ == "__main__":
     main()    
@@ -0,0 +1,151 @@
+import array
+
+"""
+Fade
+====
+
+Fade PWM duty cycles towards targets from a machine.Timer callback.
+
+fadeTo sets a target and a number of timer ticks to reach it, and starts the
+timer. Every tick the callback moves each fading channel one step closer and
+writes the duty only when it changes. Duties are held as fixed point with
+FRACTION_BITS fractional bits, so slow fades still move smoothly, and all
+state lives in arrays allocated up front: the callback allocates nothing and
+is safe as a hard interrupt. Once every channel has reached its target the
+timer stops itself, so an idle engine costs nothing and does not wake the CPU
+from lightsleep.
+
+Without machine.Timer, on the host, update can be called directly.
+"""
+
+try:
+    from machine import Timer
+except ImportError:
+    Timer = None
+
+##############################
+"""
+FadeEngine class to fade a set of PWM channels.
+
+Attributes:
+    RATE_HZ (int): Default timer rate, in updates per second.
+    FRACTION_BITS (int): Fractional bits of the duty fixed point.
+    channels (tuple): The PWM objects, each with duty_u16.
+    updates (int): Number of timer updates run.
+
+Methods:
+    fadeTo(channel, duty, ms): Fade a channel to a duty over a time.
+    busy(): Whether any channel is still fading.
+    start(): Start the timer.
+    stop(): Stop the timer.
+    update(timer): Move every fading channel one step, run by the timer.
+"""
+class FadeEngine(object):
+
+    RATE_HZ = 100
+    FRACTION_BITS = 8
+
+    def __init__(self, channels, rateHz=RATE_HZ):
+        self.channels = tuple(channels)
+        self.count = len(self.channels)
+        self.rateHz = rateHz
+
+        # Per channel state, duties in fixed point
+        self.current = array.array("l", [0 for _ in range(self.count)])
+        self.target = array.array("l", [0 for _ in range(self.count)])
+        self.step = array.array("l", [0 for _ in range(self.count)])
+        self.remaining = array.array("l", [0 for _ in range(self.count)])
+        self.written = array.array("l", [-1 for _ in range(self.count)])
+
+        self.updates = 0
+        self.running = False
+
+        # Bound once, so starting the timer never allocates a bound method
+        self.callback = self.update
+        self.timer = Timer() if Timer else None
+
+    """
+    Fade a channel from its current duty to a new one.
+
+    Args:
+        channel (int): Index of the channel.
+        duty (int): Target duty, 0 to 65535.
+        ms (int): Time to take, 0 sets the duty at once.
+
+    Returns:
+        None
+    """
+    def fadeTo(self, channel, duty, ms):
+        steps = ms * self.rateHz // 1000
+        target = duty << self.FRACTION_BITS
+
+        # Stop the callback touching this channel while it is changed
+        self.remaining[channel] = 0
+
+        if (steps < 1):
+            self.current[channel] = target
+            self.write(channel, duty)
+            return
+
+        self.target[channel] = target
+        self.step[channel] = (target - self.current[channel]) // steps
+        self.remaining[channel] = steps
+        self.start()
+
+    def busy(self):
+        for i in range(self.count):
+            if self.remaining[i]:
+                return True
+        return False
+
+    def start(self):
+        if (self.timer and not self.running):
+            self.running = True
+            self.timer.init(freq=self.rateHz, mode=Timer.PERIODIC, callback=self.callback)
+
+    def stop(self):
+        if self.timer:
+            self.timer.deinit()
+        self.running = False
+
+    """
+    Private
+
+    Write a duty to a channel if it has changed.
+
+    Returns:
+        None
+    """
+    def write(self, channel, duty):
+        if (duty != self.written[channel]):
+            self.channels[channel].duty_u16(duty)
+            self.written[channel] = duty
+
+    """
+    Move every fading channel one step, stopping the timer once none are fading.
+
+    Args:
+        timer (Timer): The timer, unused.
+
+    Returns:
+        None
+    """
+    def update(self, timer=None):
+        moving = False
+        for i in range(self.count):
+            n = self.remaining[i]
+            if n:
+                # The last step lands exactly on the target
+                if (n == 1):
+                    c = self.target[i]
+                else:
+                    c = self.current[i] + self.step[i]
+                    moving = True
+                self.current[i] = c
+                self.remaining[i] = n - 1
+                self.write(i, c >> self.FRACTION_BITS)
+
+        self.updates = self.updates + 1
+
+        if not moving:
+            self.stop()
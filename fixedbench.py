@@ -0,0 +1,111 @@
+import gc
+import sys
+import time
+from fixedpoint import servoDuty, percentOf, randomInRange
+
+"""
+Fixed point benchmark
+=====================
+
+Check the fixed point helpers in fixedpoint.py against the float code they
+replace, then time both and measure what they allocate.
+
+Every input the clock and candles use is checked: servo angles 0 to 180,
+channel values 0 to 255 at 0 to 100 percent, and every 16 bit random value for
+the ranges Candle.py draws from. The largest difference from the float result
+must be at most 1 LSB, otherwise the benchmark exits with status 1.
+
+Allocation is only measured where gc.mem_alloc exists, so run it on the Pico
+to see the saving; on the host only the comparison and timings are shown.
+
+Run with:
+    python fixedbench.py
+"""
+
+CALLS = 20000
+RANDOM_RANGES = ((0, 10), (0, 100), (77, 80), (80, 100), (50, 80), (40, 50), (30, 40), (20, 30), (10, 20))
+
+# The float code replaced by fixedpoint.py
+def floatMap(x, in_min, in_max, out_min, out_max):
+    return (x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min
+
+def floatServoDuty(angle):
+    return int(floatMap(floatMap(angle, 0, 180, 0.5, 2.5), 0, 20, 0, 65535))
+
+def floatPercentOf(c, percent):
+    return int(max(0, min(c * percent / 100, 255)))
+
+def floatRandomInRange(r, low, high):
+    return low + int(r / 65536.0 * (high - low + 1))
+
+try:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+def maxError():
+    servo = 0
+    for angle in range(181):
+        servo = max(servo, abs(servoDuty(angle) - floatServoDuty(angle)))
+
+    percent = 0
+    for c in range(256):
+        for p in range(101):
+            percent = max(percent, abs(percentOf(c, p) - floatPercentOf(c, p)))
+
+    random = 0
+    for low, high in RANDOM_RANGES:
+        for r in range(65536):
+            random = max(random, abs(randomInRange(r, low, high) - floatRandomInRange(r, low, high)))
+
+    return servo, percent, random
+
+"""
+Time CALLS calls of a function and measure the heap they allocate.
+
+Returns:
+    tuple: (us per call, bytes allocated or None)
+"""
+def measure(function, a, b):
+    gc.collect()
+    alloc = gc.mem_alloc() if hasattr(gc, "mem_alloc") else None
+    start = ticks_us()
+    for i in range(CALLS):
+        function(i % a, b)
+    elapsed = ticks_diff(ticks_us(), start)
+    if (alloc is not None):
+        alloc = gc.mem_alloc() - alloc
+    return elapsed / CALLS, alloc
+
+def servoAt(angle, unused):
+    return servoDuty(angle)
+
+def floatServoAt(angle, unused):
+    return floatServoDuty(angle)
+
+def main():
+    servo, percent, random = maxError()
+    print("max error, LSB: servo", servo, " percent", percent, " random", random)
+    failed = max(servo, percent, random) > 1
+    if failed:
+        print("FAIL: fixed point differs from float by more than 1 LSB")
+
+    print("function          float us   fixed us   float bytes   fixed bytes")
+    for name, floatFunction, fixedFunction, a, b in (
+            ("servo duty", floatServoAt, servoAt, 181, 0),
+            ("percent of", floatPercentOf, percentOf, 256, 80),
+            ("random in range", lambda r, b: floatRandomInRange(r, 77, 80), lambda r, b: randomInRange(r, 77, 80), 65536, 0)):
+        floatUs, floatBytes = measure(floatFunction, a, b)
+        fixedUs, fixedBytes = measure(fixedFunction, a, b)
+        print("{:<16} {:>9.2f} {:>10.2f} {:>13} {:>13}".format(name, floatUs, fixedUs, str(floatBytes), str(fixedBytes)))
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Fixed point
+===========
+
+Integer replacements for the float maths in the servo and candle code.
+
+MicroPython floats are heap objects, so every float operation in a loop
+allocates. These helpers use small integers only, which stay within
+MicroPython's 31 bit small int range and allocate nothing.
+
+Precision:
+ - intervalMap rounds down, so it is within 1 of the float mapping.
+ - servoDuty works in 1/16 duty steps (Q.4). The 0.5 ms and 2.5 ms pulse
+   ends are exact in Q.4, so the duty is the float duty rounded down, within
+   1 LSB of duty_u16.
+ - percentOf is exact: int(c * percent / 100) for c 0 to 255.
+ - randomInRange scales a 16 bit random value by a shift, which is exact
+   because the float code divides by 65536.
+
+fixedbench.py checks these against the float versions and times both.
+"""
+
+# Servo pulse of 0.5 ms to 2.5 ms in a 20 ms (50 Hz) period, as duty_u16 values
+SERVO_PERIOD_US = 20000
+SERVO_MIN_PULSE_US = 500
+SERVO_MAX_PULSE_US = 2500
+SERVO_MAX_ANGLE = 180
+
+# Servo duty is worked out with DUTY_FRACTION_BITS fractional bits
+DUTY_FRACTION_BITS = 4
+SERVO_MIN_DUTY = (SERVO_MIN_PULSE_US * 65535 << DUTY_FRACTION_BITS) // SERVO_PERIOD_US
+SERVO_MAX_DUTY = (SERVO_MAX_PULSE_US * 65535 << DUTY_FRACTION_BITS) // SERVO_PERIOD_US
+
+"""
+Map an integer from one range to another, rounding down.
+
+Args:
+    x (int): The input value to be mapped.
+    in_min (int): The minimum value of the input range.
+    in_max (int): The maximum value of the input range.
+    out_min (int): The minimum value of the output range.
+    out_max (int): The maximum value of the output range.
+
+Returns:
+    int: The mapped value.
+"""
+def intervalMap(x, in_min, in_max, out_min, out_max):
+    return (x - in_min) * (out_max - out_min) // (in_max - in_min) + out_min
+
+"""
+PWM duty for a servo angle.
+
+Args:
+    angle (int): The angle, 0 to 180 degrees.
+
+Returns:
+    int: The duty_u16 value.
+"""
+def servoDuty(angle):
+    return intervalMap(angle, 0, SERVO_MAX_ANGLE, SERVO_MIN_DUTY, SERVO_MAX_DUTY) >> DUTY_FRACTION_BITS
+
+"""
+Scale a color channel by a percentage, clamped to 0 to 255.
+
+Args:
+    c (int): The channel value, 0 to 255.
+    percent (int): The brightness in percent.
+
+Returns:
+    int: The scaled channel value.
+"""
+def percentOf(c, percent):
+    value = c * percent // 100
+    if (value > 255):
+        return 255
+    if (value < 0):
+        return 0
+    return value
+
+"""
+Scale a 16 bit random value into a range.
+
+Args:
+    r (int): Random value, 0 to 65535.
+    low (int): The smallest result.
+    high (int): The largest result.
+
+Returns:
+    int: A value from low to high inclusive.
+"""
+def randomInRange(r, low, high):
+    return low + ((r * (high - low + 1)) >> 16)
@@ -0,0 +1,269 @@
+import array
+import sys
+from fixedpoint import percentOf, randomInRange
+from pixels import txDreq
+
+"""
+Flicker
+=======
+
+Candle flicker generated by PIO and DMA, so a flickering candle costs the CPU nothing.
+
+The candleFlicker program is a PWM generator. Each word it pulls is one entry of
+a flicker pattern: a brightness level held for a number of PWM periods.
+
+Word (shifted out LSB first):
+    bits 0-15: hold - 1, in PWM periods
+    bits 16-23: high count, the level
+    bits 24-31: low count, 255 - level
+
+Each PWM period is high for level + 2 cycles and low for 259 - level cycles,
+PERIOD_CYCLES in all, with 3 more low cycles while the next entry is pulled.
+At FREQ one period is 1 ms, so the hold is in ms.
+
+FlickerOutput loops a preloaded pattern into the state machine with two DMA
+channels: the data channel copies the pattern into the TX FIFO, paced by the
+state machine, then chains to a control channel that writes the pattern
+address back into the data channel and retriggers it. Changing pattern is one
+word written to the address the control channel reads.
+
+Patterns are drawn from the candle brightness and duration probabilities
+below, which candlestrip.py shares, using a seeded 16 bit xorshift so each
+candle has its own pattern and the host sees the same patterns as the Pico.
+A steady pattern holds one level, so a steadily lit candle also runs from PIO.
+
+The module runs on the host to check the pattern timing in the PIO emulator:
+    python flicker.py
+"""
+
+try:
+    import rp2
+    from machine import Pin
+    import uctypes
+except ImportError:
+    rp2 = None
+
+# PWM period of the program in cycles, and the frequency giving a 1 ms period
+PERIOD_CYCLES = 261
+FREQ = PERIOD_CYCLES * 1000
+
+# Extra low cycles at the start of each entry, for pull, out and mov
+ENTRY_CYCLES = 3
+
+PATTERN_LENGTH = 128
+
+# (cumulative chance in percent, lowest, highest) brightness in percent
+#   50% 77% -  80% (barely noticeable)
+#   30% 80% - 100% (very noticeable, air flicker)
+#    5% 50% -  80% (very noticeable, blown out flame)
+#    5% 40% -  50% (very noticeable, blown out flame)
+#   10% 30% -  40% (very noticeable, blown out flame)
+BRIGHTNESS_CHANCES = ((50, 77, 80), (80, 80, 100), (85, 50, 80), (90, 40, 50), (100, 30, 40))
+
+# (cumulative chance in percent, shortest, longest) hold in ms
+#   90% 20 ms
+#    3% 20 - 30 ms
+#    3% 10 - 20 ms
+#    4%  1 - 10 ms
+HOLD_CHANCES = ((90, 20, 20), (93, 20, 30), (96, 10, 20), (100, 1, 10))
+
+# DMA channel register that sets the read address and triggers the channel
+DMA_READ_ADDR_TRIG = 15
+
+def candleFlicker():
+    wrap_target()
+    pull(block)             .side(0)
+    out(y, 16)              .side(0)
+    mov(isr, osr)           .side(0)
+    label("period")
+    mov(osr, isr)           .side(0)
+    out(x, 8)               .side(1)
+    label("high")
+    jmp(x_dec, "high")      .side(1)
+    out(x, 8)               .side(0)
+    label("low")
+    jmp(x_dec, "low")       .side(0)
+    jmp(y_dec, "period")    .side(0)
+    wrap()
+
+if rp2:
+    flicker = rp2.asm_pio(sideset_init=rp2.PIO.OUT_LOW, out_shiftdir=rp2.PIO.SHIFT_RIGHT)(candleFlicker)
+
+"""
+Pack a level and hold into a pattern word.
+
+Args:
+    level (int): Brightness, 0 to 255.
+    holdMs (int): Time to hold it, 1 to 65536 ms.
+
+Returns:
+    int: The pattern word.
+"""
+def packEntry(level, holdMs):
+    return ((255 - level) << 24) | (level << 16) | (holdMs - 1)
+
+def xorshift(r):
+    r = r ^ ((r << 7) & 0xFFFF)
+    r = r ^ (r >> 9)
+    return r ^ ((r << 8) & 0xFFFF)
+
+"""
+Draw a value from a table of (cumulative chance, lowest, highest).
+
+Returns:
+    tuple: (value, next random state)
+"""
+def draw(chances, r):
+    r = xorshift(r)
+    chance = randomInRange(r, 0, 99)
+    for limit, low, high in chances:
+        if (chance < limit):
+            r = xorshift(r)
+            return randomInRange(r, low, high), r
+    return high, r
+
+"""
+Generate a flicker pattern.
+
+Args:
+    length (int): Number of entries.
+    seed (int): Seed, giving each candle its own pattern.
+    scale (int): Overall brightness in 1/256ths, 256 for full brightness.
+
+Returns:
+    array.array: The pattern words.
+"""
+def flickerPattern(length, seed, scale=256):
+    pattern = array.array("I", [0 for _ in range(length)])
+    r = (seed & 0xFFFF) or 1
+    for i in range(length):
+        percent, r = draw(BRIGHTNESS_CHANCES, r)
+        holdMs, r = draw(HOLD_CHANCES, r)
+        pattern[i] = packEntry(percentOf(255, percent) * scale >> 8, holdMs)
+    return pattern
+
+"""
+Generate a steady pattern, the same length as a flicker pattern.
+
+Args:
+    length (int): Number of entries.
+    level (int): Brightness, 0 to 255.
+
+Returns:
+    array.array: The pattern words.
+"""
+def steadyPattern(length, level):
+    return array.array("I", [packEntry(level, 20) for _ in range(length)])
+
+##############################
+"""
+FlickerOutput - loop flicker patterns into a PIO state machine with DMA.
+
+Attributes:
+    patterns (tuple): Patterns of equal length, one of which is playing.
+    sm (rp2.StateMachine): StateMachine running candleFlicker, or None when stopped.
+
+Methods:
+    start(): Start flickering on the pin.
+    stop(): Stop the state machine and DMA.
+    setPattern(index): Switch pattern at the end of the current loop.
+"""
+class FlickerOutput(object):
+
+    def __init__(self, pinNum, smId, patterns):
+        self.pinNum = pinNum
+        self.smId = smId
+        self.patterns = patterns
+        self.length = len(patterns[0])
+
+        # Read by the control channel at the end of every loop of the pattern
+        self.address = array.array("I", [uctypes.addressof(patterns[0])])
+
+        self.sm = None
+        self.data = rp2.DMA()
+        self.control = rp2.DMA()
+
+    def start(self):
+        self.sm = rp2.StateMachine(self.smId, flicker, freq=FREQ, sideset_base=Pin(self.pinNum))
+        self.sm.active(1)
+
+        self.data.config(read=self.patterns[0], write=self.sm, count=self.length,
+                         ctrl=self.data.pack_ctrl(size=2, inc_write=False, treq_sel=txDreq(self.smId),
+                                                  chain_to=self.control.channel))
+        self.control.config(read=self.address,
+                            write=uctypes.addressof(self.data.registers) + 4 * DMA_READ_ADDR_TRIG, count=1,
+                            ctrl=self.control.pack_ctrl(size=2, inc_read=False, inc_write=False),
+                            trigger=True)
+
+    def stop(self):
+        # A disabled channel ignores the chain trigger, so the loop ends here
+        self.control.active(0)
+        self.data.active(0)
+        if self.sm:
+            self.sm.active(0)
+            self.sm = None
+
+    def setPattern(self, index):
+        self.address[0] = uctypes.addressof(self.patterns[index])
+
+"""
+Run a pattern through the candleFlicker program in the PIO emulator and check
+that every PWM period and every entry has the expected timing.
+
+Args:
+    pattern (array.array): The pattern words.
+
+Returns:
+    tuple: (timing errors, PWM periods, largest entry error from its hold in us, cycles run)
+"""
+def check(pattern):
+    import pioemu
+
+    sm = pioemu.StateMachine(pioemu.assemble(candleFlicker), shiftRight=True)
+    sm.put(pattern)
+
+    holdTotal = 0
+    for word in pattern:
+        holdTotal = holdTotal + (word & 0xFFFF) + 1
+    sm.run(holdTotal * PERIOD_CYCLES * 2)
+
+    rising = [cycle for cycle, level in sm.trace if level == 1]
+    falling = [cycle for cycle, level in sm.trace if level == 0][1:]
+
+    # Every period of the pattern must have been played
+    errors = abs(len(rising) - holdTotal)
+    worstUs = 0.0
+    period = 0
+    for i, word in enumerate(pattern):
+        level = (word >> 16) & 0xFF
+        hold = (word & 0xFFFF) + 1
+
+        for k in range(period, min(period + hold, len(falling))):
+            if (falling[k] - rising[k] != level + 2):
+                errors = errors + 1
+
+        # Each entry runs from its first rising edge to the next entry's
+        if (i + 1 < len(pattern) and period + hold < len(rising)):
+            cycles = rising[period + hold] - rising[period]
+            expected = hold * PERIOD_CYCLES + ENTRY_CYCLES
+            if (cycles != expected):
+                errors = errors + 1
+            worstUs = max(worstUs, abs(cycles - hold * PERIOD_CYCLES) * 1000000 / FREQ)
+        period = period + hold
+
+    return errors, len(rising), worstUs, sm.cycle
+
+def main():
+    pattern = flickerPattern(PATTERN_LENGTH, 1)
+    errors, periods, worstUs, cycles = check(pattern)
+
+    print("entries:", len(pattern), " PWM periods:", periods)
+    print("PWM frequency: {} Hz, pattern loop: {:.3f} s".format(FREQ // PERIOD_CYCLES, cycles / FREQ))
+    print("largest entry error from its hold time: {:.1f} us".format(worstUs))
+    if errors:
+        print("FAIL:", errors, "timing errors")
+        sys.exit(1)
+    print("OK: every period and entry has the expected timing")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import array
+
+"""
+History
+=======
+
+Rolling 24 hour sensor history held in RAM.
+
+Each series is a fixed size ring buffer of samples stored in an array, with an
+incremental sum for the average and a monotonic deque each for the minimum and
+maximum, so adding a sample and reading min, max and average are all O(1)
+amortised and nothing is allocated after start-up.
+
+The deques hold ring buffer slots rather than values. The front of the min deque is
+always the oldest sample still in the window that is smaller than everything after
+it, so it is the window minimum; samples that can never be the minimum again are
+dropped from the back as new samples arrive. The max deque works the same way.
+"""
+
+##############################
+"""
+RollingSeries class for a fixed size window of samples.
+
+Attributes:
+    size (int): Number of samples in the window.
+    values (array.array): Ring buffer of samples.
+    count (int): Number of samples ever added.
+    total (int): Sum of the samples in the window.
+
+Methods:
+    add(value): Add a sample, dropping the oldest once the window is full.
+    length(): Number of samples in the window.
+    min(): Smallest sample in the window.
+    max(): Largest sample in the window.
+    average(): Integer average of the samples in the window.
+    drawSparkline(fb, x, y, width, height): Draw the window as a sparkline.
+"""
+class RollingSeries(object):
+
+    def __init__(self, size, typecode):
+        self.size = size
+        self.values = array.array(typecode, [0 for _ in range(size)])
+        self.count = 0
+        self.total = 0
+
+        # Monotonic deques of ring buffer slots, each a ring of size entries
+        self.minQueue = array.array("H", [0 for _ in range(size)])
+        self.minHead = 0
+        self.minLength = 0
+        self.maxQueue = array.array("H", [0 for _ in range(size)])
+        self.maxHead = 0
+        self.maxLength = 0
+
+    def add(self, value):
+        size = self.size
+        n = self.count
+        values = self.values
+        i = n % size
+
+        if (n >= size):
+            self.total = self.total - values[i]
+
+            # The sample in slot i is leaving the window, it can only be at the front
+            if (self.minQueue[self.minHead] == i):
+                self.minHead = (self.minHead + 1) % size
+                self.minLength = self.minLength - 1
+            if (self.maxQueue[self.maxHead] == i):
+                self.maxHead = (self.maxHead + 1) % size
+                self.maxLength = self.maxLength - 1
+
+        values[i] = value
+        self.total = self.total + value
+
+        # Drop samples that can never be the minimum or maximum again
+        minQueue = self.minQueue
+        while (self.minLength and values[minQueue[(self.minHead + self.minLength - 1) % size]] >= value):
+            self.minLength = self.minLength - 1
+        minQueue[(self.minHead + self.minLength) % size] = i
+        self.minLength = self.minLength + 1
+
+        maxQueue = self.maxQueue
+        while (self.maxLength and values[maxQueue[(self.maxHead + self.maxLength - 1) % size]] <= value):
+            self.maxLength = self.maxLength - 1
+        maxQueue[(self.maxHead + self.maxLength) % size] = i
+        self.maxLength = self.maxLength + 1
+
+        self.count = n + 1
+
+    def length(self):
+        return self.count if self.count < self.size else self.size
+
+    def min(self):
+        return self.values[self.minQueue[self.minHead]] if self.minLength else 0
+
+    def max(self):
+        return self.values[self.maxQueue[self.maxHead]] if self.maxLength else 0
+
+    def average(self):
+        n = self.length()
+        return self.total // n if n else 0
+
+    """
+    Draw the window, oldest sample on the left, as a sparkline in a single pass.
+    Each column shows the range of the samples that fall in it, scaled between
+    the window minimum and maximum.
+
+    Args:
+        fb (framebuf.FrameBuffer): The framebuffer to draw on, such as an SSD1306.
+        x (int): Left of the sparkline.
+        y (int): Top of the sparkline.
+        width (int): Width of the sparkline in pixels.
+        height (int): Height of the sparkline in pixels.
+
+    Returns:
+        None
+    """
+    def drawSparkline(self, fb, x, y, width, height):
+        n = self.length()
+        if (n == 0):
+            return
+
+        size = self.size
+        values = self.values
+        lo = self.min()
+        span = self.max() - lo
+        bottom = y + height - 1
+        start = (self.count - n) % size
+
+        column = -1
+        columnLow = 0
+        columnHigh = 0
+
+        for k in range(n):
+            if span:
+                py = bottom - (values[(start + k) % size] - lo) * (height - 1) // span
+            else:
+                py = y + height // 2
+
+            c = k * width // n
+            if (c != column):
+                if (column >= 0):
+                    fb.vline(x + column, columnHigh, columnLow - columnHigh + 1, 1)
+                column = c
+                columnLow = py
+                columnHigh = py
+            elif (py > columnLow):
+                columnLow = py
+            elif (py < columnHigh):
+                columnHigh = py
+
+        fb.vline(x + column, columnHigh, columnLow - columnHigh + 1, 1)
+
+##############################
+"""
+SensorHistory class for the last 24 hours of temperature and humidity.
+
+Attributes:
+    SAMPLES (int): Number of samples kept, one a minute for 24 hours.
+    temperature (RollingSeries): Temperature in degrees C.
+    humidity (RollingSeries): Humidity in percent.
+
+Methods:
+    add(temperature, humidity): Add a reading.
+"""
+class SensorHistory(object):
+
+    SAMPLES = 1440
+
+    def __init__(self, samples=SAMPLES):
+        self.temperature = RollingSeries(samples, "b")
+        self.humidity = RollingSeries(samples, "B")
+
+    def add(self, temperature, humidity):
+        self.temperature.add(temperature)
+        self.humidity.add(humidity)
@@ -0,0 +1,402 @@
+import gc
+import os
+import sys
+import time
+import types
+import datetime
+import tempfile
+import threading
+
+"""
+Host board
+==========
+
+Stand-ins for the Pico hardware modules clock.py imports, so the real main loop
+can run on the host against a simulated board.
+
+install puts fake machine, ssd1306, ds1302, dht, rp2 and uctypes modules into
+sys.modules and adds the MicroPython ticks and sleep_ms functions to time. Time
+on the board only moves when the main thread sleeps or lightsleeps, so a run is
+deterministic and hours of clock time pass in seconds. Other threads, such as
+the ring renderer standing in for core 1, sleep in real time.
+
+The fakes keep the state a test needs: the light level read by the ADC, the
+DHT11 reading, and the date and time the DS1302 returns.
+
+runClock runs clock.main for a number of passes of the main loop, calling back
+after each one. The clock's files, the settings slots and sensor log, are
+written to a temporary directory standing in for the Pico's flash. The loop is
+left by raising StopClock from PowerManager.sleep, or from the callback.
+
+This module only runs on the host.
+"""
+
+# Modules replaced by install, and the modules that import them
+FAKE_MODULES = ("machine", "ssd1306", "ds1302", "dht", "rp2", "uctypes")
+BOARD_MODULES = ("clock", "pixels", "flicker", "lightstar", "fade", "renderer", "settings")
+
+class StopClock(Exception):
+    pass
+
+##############################
+"""
+Board class holding the state of the simulated board.
+
+Attributes:
+    ms (int): Milliseconds since power-up.
+    start (datetime.datetime): RTC date and time at power-up.
+    light (int): Raw ADC light level, higher is darker.
+    temperature (int): DHT11 temperature in degrees C.
+    humidity (int): DHT11 humidity in percent.
+    dhtFails (bool): Make every DHT11 measurement fail.
+    sleeps (int): Number of sleep_ms and lightsleep calls by the main thread.
+
+Methods:
+    now(): The RTC date and time.
+    advance(ms): Move board time on.
+"""
+class Board(object):
+
+    # A DHT11 does not answer until this long after power-up
+    DHT_STARTUP_MS = 1000
+
+    def __init__(self, start):
+        self.ms = 0
+        self.start = start
+        self.offset = datetime.timedelta(0)
+        self.light = 0
+        self.temperature = 21
+        self.humidity = 45
+        self.dhtFails = False
+        self.sleeps = 0
+        self.mainThread = threading.get_ident()
+
+    def now(self):
+        return self.start + self.offset + datetime.timedelta(milliseconds=self.ms)
+
+    def setNow(self, when):
+        self.offset = when - self.start - datetime.timedelta(milliseconds=self.ms)
+
+    def advance(self, ms):
+        self.ms = self.ms + ms
+
+    def ticks_ms(self):
+        return self.ms
+
+    def ticks_us(self):
+        return self.ms * 1000
+
+    def sleep_ms(self, ms):
+        if (threading.get_ident() != self.mainThread):
+            time.sleep(ms / 1000)
+            return
+        self.sleeps = self.sleeps + 1
+        self.advance(ms)
+
+"""
+Create the fake hardware modules for a board.
+
+Returns:
+    dict: Module name to module.
+"""
+def fakeModules(board):
+
+    # machine
+
+    class Pin(object):
+        IN = 0
+        OUT = 1
+        IRQ_RISING = 8
+
+        def __init__(self, id, mode=-1, value=None):
+            self.id = id
+            self.level = value or 0
+            self.handler = None
+
+        def value(self, level=None):
+            if (level is None):
+                return self.level
+            self.level = level
+
+        def irq(self, trigger=None, handler=None):
+            self.handler = handler
+
+    class ADC(object):
+        def __init__(self, pin):
+            self.pin = pin
+
+        def read_u16(self):
+            return board.light
+
+    class PWM(object):
+        def __init__(self, pin):
+            self.pin = pin
+            self.duty = 0
+
+        def freq(self, freq=None):
+            pass
+
+        def duty_u16(self, duty=None):
+            if (duty is None):
+                return self.duty
+            self.duty = duty
+
+        def deinit(self):
+            pass
+
+    class I2C(object):
+        def __init__(self, bus, sda=None, scl=None, freq=400_000):
+            self.freq = freq
+
+        def writeto(self, address, buffer):
+            return len(buffer)
+
+        def writevto(self, address, vectors):
+            return sum(len(v) for v in vectors)
+
+    class Timer(object):
+        PERIODIC = 1
+
+        def init(self, freq=None, mode=None, callback=None):
+            self.callback = callback
+
+        def deinit(self):
+            pass
+
+    def lightsleep(ms=0):
+        board.sleeps = board.sleeps + 1
+        board.advance(ms)
+
+    machine = types.ModuleType("machine")
+    machine.Pin = Pin
+    machine.ADC = ADC
+    machine.PWM = PWM
+    machine.I2C = I2C
+    machine.Timer = Timer
+    machine.lightsleep = lightsleep
+
+    # ssd1306
+
+    class SSD1306_I2C(object):
+        def __init__(self, width, height, i2c):
+            self.buffer = bytearray(width * height // 8)
+
+        def fill(self, c):
+            pass
+
+        def text(self, s, x, y, c=1):
+            pass
+
+        def vline(self, x, y, h, c):
+            pass
+
+        def contrast(self, level):
+            pass
+
+    ssd1306 = types.ModuleType("ssd1306")
+    ssd1306.SSD1306_I2C = SSD1306_I2C
+
+    # ds1302
+
+    class DS1302(object):
+        def __init__(self, clk, dio, cs):
+            pass
+
+        def year(self):
+            return board.now().year
+
+        def month(self):
+            return board.now().month
+
+        def day(self):
+            return board.now().day
+
+        def weekday(self):
+            return board.now().isoweekday()
+
+        def hour(self, hour=None):
+            if (hour is None):
+                return board.now().hour
+            board.setNow(board.now().replace(hour=hour))
+
+        def minute(self, minute=None):
+            if (minute is None):
+                return board.now().minute
+            board.setNow(board.now().replace(minute=minute))
+
+        def second(self, second=None):
+            if (second is None):
+                return board.now().second
+            board.setNow(board.now().replace(second=second))
+
+        def date_time(self, dt=None):
+            if (dt is None):
+                return [self.year(), self.month(), self.day(), self.weekday(),
+                        self.hour(), self.minute(), self.second()]
+            board.setNow(datetime.datetime(dt[0], dt[1], dt[2], dt[4], dt[5], dt[6]))
+
+    ds1302 = types.ModuleType("ds1302")
+    ds1302.DS1302 = DS1302
+
+    # dht
+
+    class DHT11(object):
+        def __init__(self, pin):
+            pass
+
+        def measure(self):
+            if (board.dhtFails or board.ms < board.DHT_STARTUP_MS):
+                raise OSError("DHT11 timeout")
+
+        def temperature(self):
+            return board.temperature
+
+        def humidity(self):
+            return board.humidity
+
+    dht = types.ModuleType("dht")
+    dht.DHT11 = DHT11
+
+    # rp2 and uctypes
+
+    class PIO(object):
+        OUT_LOW = 0
+        SHIFT_LEFT = 0
+        SHIFT_RIGHT = 1
+
+    def asm_pio(**options):
+        return lambda program: program
+
+    class StateMachine(object):
+        def __init__(self, id, program, freq=None, sideset_base=None):
+            self.id = id
+
+        def active(self, value=None):
+            return 0
+
+        def put(self, value, shift=0):
+            pass
+
+    class DMA(object):
+        channels = 0
+
+        def __init__(self):
+            self.channel = DMA.channels
+            DMA.channels = DMA.channels + 1
+            self.registers = bytearray(64)
+            self.read = None
+            self.count = 0
+
+        def config(self, **options):
+            pass
+
+        def pack_ctrl(self, **options):
+            return 0
+
+        def active(self, value=None):
+            return 0
+
+    rp2 = types.ModuleType("rp2")
+    rp2.PIO = PIO
+    rp2.asm_pio = asm_pio
+    rp2.StateMachine = StateMachine
+    rp2.DMA = DMA
+
+    uctypes = types.ModuleType("uctypes")
+    # Addresses on the Pico are 32 bit
+    uctypes.addressof = lambda obj: id(obj) & 0xFFFFFFFF
+    uctypes.bytearray_at = lambda address, size: bytearray(size)
+
+    return {"machine": machine, "ssd1306": ssd1306, "ds1302": ds1302, "dht": dht, "rp2": rp2, "uctypes": uctypes}
+
+"""
+Install the fake hardware and MicroPython time functions.
+
+Any board module already imported, such as pixels.py without rp2, is dropped so
+that the next import sees the fakes.
+
+Args:
+    start (datetime.datetime): RTC date and time at power-up.
+
+Returns:
+    Board: The simulated board.
+"""
+def install(start):
+    board = Board(start)
+
+    for name in FAKE_MODULES + BOARD_MODULES:
+        sys.modules.pop(name, None)
+    sys.modules.update(fakeModules(board))
+
+    time.ticks_ms = board.ticks_ms
+    time.ticks_us = board.ticks_us
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
+    time.sleep_ms = board.sleep_ms
+    return board
+
+"""
+Remove the fakes, so later imports see the host again.
+
+Returns:
+    None
+"""
+def uninstall():
+    for name in FAKE_MODULES + BOARD_MODULES:
+        sys.modules.pop(name, None)
+    for name in ("ticks_ms", "ticks_us", "ticks_diff", "ticks_add", "sleep_ms"):
+        if hasattr(time, name):
+            delattr(time, name)
+
+"""
+Run clock.main for a number of passes of the main loop.
+
+Args:
+    clock (module): The clock module, imported after install.
+    passes (int): Number of passes to run.
+    onPass (function): Called with the pass number and the PowerManager after each pass, or None.
+
+Returns:
+    None
+"""
+def runClock(clock, passes, onPass=None):
+    sleep = clock.PowerManager.sleep
+    startRenderer = clock.NeoPixelRing.startRenderer
+    rings = []
+    count = [0]
+
+    def passSleep(power, sec):
+        sleep(power, sec)
+        if onPass:
+            onPass(count[0], power)
+        count[0] = count[0] + 1
+        if (count[0] >= passes):
+            raise StopClock()
+
+    def recordRing(ring, others=()):
+        rings.append(ring)
+        startRenderer(ring, others)
+
+    clock.PowerManager.sleep = passSleep
+    clock.NeoPixelRing.startRenderer = recordRing
+
+    # The loop collects garbage every pass; leave the host's own objects, such
+    # as a test runner's, out of those collections
+    gc.collect()
+    gc.freeze()
+    cwd = os.getcwd()
+    flash = tempfile.TemporaryDirectory()
+    os.chdir(flash.name)
+    try:
+        clock.main()
+    except StopClock:
+        pass
+    finally:
+        gc.unfreeze()
+        os.chdir(cwd)
+        flash.cleanup()
+        clock.PowerManager.sleep = sleep
+        clock.NeoPixelRing.startRenderer = startRenderer
+        for ring in rings:
+            if (ring.renderer and ring.renderer.running):
+                ring.renderer.stop()
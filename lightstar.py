@@ -0,0 +1,136 @@
+from machine import Pin, PWM
+import array
+from fade import FadeEngine
+
+##############################
+"""
+LightStar - interface to RGB LED
+
+The hourly colours are precomputed for every brightness step, so changing step
+only swaps which table illuminate reads.
+
+Once startFader has been called, colour changes fade over FADE_MS from a timer
+interrupt instead of jumping, so fading costs the caller nothing.
+
+Attributes:
+    STEP_SCALES (tuple): Brightness of each step as a 16 bit fixed point multiplier.
+    hourTables (tuple): Red, green and blue duty for every hour, one table per step.
+    hourColors (array.array): The table for the current step.
+    FADE_MS (int): Default time taken by a fade.
+    fader (FadeEngine): Fade engine for the three channels, or None to change at once.
+
+Methods:
+    illuminate
+    setStep
+    startFader
+"""
+class LightStar(object):
+
+    # Darkest room first, the last step is full brightness
+    STEP_SCALES = (16384, 32768, 49152, 65536)
+    
+    FADE_MS = 400
+
+    def __init__(self): 
+        # Initialize PWM for each color channel of an RGB LED
+        self.red = PWM(Pin(2))  # Red channel on GPIO pin 26
+        self.green = PWM(Pin(6))  # Green channel on GPIO pin 27
+        self.blue = PWM(Pin(7))  # Blue channel on GPIO pin 28
+
+        # Set 1000 Hz frequency for all channels
+        self.red.freq(1000)
+        self.green.freq(1000)
+        self.blue.freq(1000)
+        
+        self.MAX_BRIGHTNESS = 65535
+        self.MIN_BRIGHTNESS = 5535
+        
+        # Red, green and blue duty for every hour at every step, computed once
+        tables = []
+        for scale in self.STEP_SCALES:
+            table = array.array("H", [0 for _ in range(3 * 24)])
+            for hour in range(24):
+                r, g, b = self.hourColor(hour)
+                table[3 * hour] = (r * scale) >> 16
+                table[3 * hour + 1] = (g * scale) >> 16
+                table[3 * hour + 2] = (b * scale) >> 16
+            tables.append(table)
+        self.hourTables = tuple(tables)
+        self.hourColors = self.hourTables[-1]
+        
+        # Last duty written to each channel, so unchanged channels are not rewritten
+        self.lastRed = -1
+        self.lastGreen = -1
+        self.lastBlue = -1
+        
+        self.fader = None
+        self.fadeMs = self.FADE_MS
+
+    # Fade between colours from a timer interrupt from now on
+    def startFader(self, fadeMs=FADE_MS, rateHz=FadeEngine.RATE_HZ):
+        if (self.fader is None):
+            self.fader = FadeEngine((self.red, self.green, self.blue), rateHz)
+        self.fadeMs = fadeMs
+        return self.fader
+
+    # Function to set RGB LED color, only touching the channels that change
+    def light(self, r, g, b):
+        if self.fader:
+            self.fade(r, g, b, self.fadeMs)
+            return
+        if (r != self.lastRed):
+            self.red.duty_u16(r)  # Red intensity
+            self.lastRed = r
+        if (g != self.lastGreen):
+            self.green.duty_u16(g)  # Green intensity
+            self.lastGreen = g
+        if (b != self.lastBlue):
+            self.blue.duty_u16(b)  # Blue intensity
+            self.lastBlue = b
+
+    # Start fading the channels that change towards a new colour
+    def fade(self, r, g, b, ms):
+        if (r != self.lastRed):
+            self.fader.fadeTo(0, r, ms)
+            self.lastRed = r
+        if (g != self.lastGreen):
+            self.fader.fadeTo(1, g, ms)
+            self.lastGreen = g
+        if (b != self.lastBlue):
+            self.fader.fadeTo(2, b, ms)
+            self.lastBlue = b
+
+    # Method to set RGB LED color, switching off at once rather than fading
+    def off(self):
+        if self.fader:
+            self.fade(0, 0, 0, 0)
+        else:
+            self.light(0, 0, 0)
+        
+    # Compute the red, green and blue duty for an hour
+    def hourColor(self, hour):
+                  
+        MULTIPLIER = 3600
+        greenBrightness = 32000
+        
+        redBrightness = (hour * MULTIPLIER) +  20000
+        
+        hour  = abs(hour - 23)
+        blueBrightness = abs((hour * MULTIPLIER) - 10000)
+        
+        if (redBrightness >= self.MAX_BRIGHTNESS):
+            redBrightness = self.MAX_BRIGHTNESS
+            
+        if (blueBrightness >= self.MAX_BRIGHTNESS):
+            blueBrightness = 0           
+        
+        return (redBrightness, greenBrightness, blueBrightness)
+        
+    # Method to set RGB LED color from the hourly colour table
+    def illuminate(self, hour):
+        k = 3 * hour
+        self.light(self.hourColors[k], self.hourColors[k + 1], self.hourColors[k + 2])
+
+    # Switch to the hourly colour table for a brightness step, taking effect on the next illuminate
+    def setStep(self, step):
+        self.hourColors = self.hourTables[step]
@@ -0,0 +1,339 @@
+"""
+PIO emulator
+============
+
+Run the PIO programs used by the clock on the host, cycle by cycle.
+
+A program is written once as a plain function in the rp2.asm_pio dialect and
+decorated with rp2.asm_pio on the Pico. On the host, assemble runs the same
+function with recording stand-ins for the assembler names, so the emulator
+checks the program that actually ships.
+
+StateMachine covers the subset of instructions the programs use: jmp, out,
+pull, mov, set and nop, with side-set on one pin, delays, wrap and autopull.
+run records the side-set pin as a list of (cycle, level) changes, which
+writeVcd saves for a waveform viewer such as GTKWave.
+
+This module only runs on the host.
+"""
+
+import types
+
+# VCD identifier of the traced pin
+VCD_ID = "!"
+
+# Operand names, as the assembler exposes them to programs
+OPERANDS = ("x", "y", "null", "isr", "osr", "pins", "pindirs", "pc", "exec",
+            "not_x", "x_dec", "not_y", "y_dec", "x_not_y", "pin", "not_osre",
+            "block", "noblock", "iffull", "ifempty")
+
+##############################
+"""
+Instruction recorded by the assembler stand-ins.
+
+Attributes:
+    op (str): The instruction, such as "jmp" or "out".
+    args (tuple): The operands.
+    sideValue (int): Side-set value, or None.
+    delay (int): Delay cycles after the instruction.
+"""
+class Instruction(object):
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+        self.sideValue = None
+        self.delay = 0
+
+    def side(self, value):
+        self.sideValue = value
+        return self
+
+    def __getitem__(self, delay):
+        self.delay = delay
+        return self
+
+##############################
+"""
+Program assembled on the host.
+
+Attributes:
+    instructions (list): The Instructions in order.
+    labels (dict): Instruction index of each label.
+    wrapTarget (int): Index execution wraps to.
+    wrap (int): Index after which execution wraps.
+"""
+class Program(object):
+
+    def __init__(self):
+        self.instructions = []
+        self.labels = {}
+        self.wrapTarget = 0
+        self.wrap = None
+
+"""
+Assemble an rp2.asm_pio style program function on the host.
+
+Args:
+    function (function): The undecorated program.
+
+Returns:
+    Program: The assembled program.
+"""
+def assemble(function):
+    program = Program()
+
+    def emit(op):
+        def instruction(*args):
+            i = Instruction(op, args)
+            program.instructions.append(i)
+            return i
+        return instruction
+
+    def label(name):
+        program.labels[name] = len(program.instructions)
+
+    def wrap_target():
+        program.wrapTarget = len(program.instructions)
+
+    def wrap():
+        program.wrap = len(program.instructions) - 1
+
+    names = dict((name, name) for name in OPERANDS)
+    names.update(label=label, wrap_target=wrap_target, wrap=wrap)
+    for op in ("jmp", "out", "pull", "mov", "set", "nop", "in_", "push", "wait", "irq"):
+        names[op] = emit(op)
+
+    types.FunctionType(function.__code__, names)()
+
+    if (program.wrap is None):
+        program.wrap = len(program.instructions) - 1
+    return program
+
+##############################
+"""
+StateMachine emulating one PIO state machine with one side-set pin.
+
+Attributes:
+    program (Program): The program being run.
+    fifo (list): Words waiting in the TX FIFO, oldest first.
+    cycle (int): Cycles run.
+    pin (int): Level of the side-set pin.
+    trace (list): (cycle, level) for every change of the side-set pin.
+    stalled (bool): Whether the last instruction stalled on an empty FIFO.
+
+Methods:
+    put(words): Add words to the TX FIFO.
+    run(maxCycles): Run until the FIFO runs dry or maxCycles have passed.
+"""
+class StateMachine(object):
+
+    def __init__(self, program, shiftRight=True, autopull=False, pullThresh=32, pin=0):
+        self.program = program
+        self.shiftRight = shiftRight
+        self.autopull = autopull
+        self.pullThresh = pullThresh
+
+        self.x = 0
+        self.y = 0
+        self.isr = 0
+        self.osr = 0
+        # OSR starts empty, so the first autopull refills it
+        self.osrCount = 32
+        self.pc = program.wrapTarget
+
+        self.fifo = []
+        self.cycle = 0
+        self.pin = pin
+        self.trace = [(0, pin)]
+        self.stalled = False
+
+    def put(self, words):
+        self.fifo.extend(words)
+
+    def setPin(self, level):
+        if (level != self.pin):
+            self.pin = level
+            self.trace.append((self.cycle, level))
+
+    """
+    Private
+
+    Take the next word from the FIFO into OSR.
+
+    Returns:
+        bool: False if the FIFO was empty.
+    """
+    def pull(self):
+        if not self.fifo:
+            return False
+        self.osr = self.fifo.pop(0)
+        self.osrCount = 0
+        return True
+
+    """
+    Private
+
+    Shift bits out of OSR.
+
+    Returns:
+        int: The bits shifted out.
+    """
+    def shiftOut(self, n):
+        mask = (1 << n) - 1 if n < 32 else 0xFFFFFFFF
+        if self.shiftRight:
+            value = self.osr & mask
+            self.osr = self.osr >> n if n < 32 else 0
+        else:
+            value = (self.osr >> (32 - n)) & mask
+            self.osr = (self.osr << n) & 0xFFFFFFFF
+        self.osrCount = min(self.osrCount + n, 32)
+        return value
+
+    def read(self, source):
+        if (source == "x"):
+            return self.x
+        if (source == "y"):
+            return self.y
+        if (source == "isr"):
+            return self.isr
+        if (source == "osr"):
+            return self.osr
+        return 0
+
+    def store(self, dest, value):
+        value = value & 0xFFFFFFFF
+        if (dest == "x"):
+            self.x = value
+        elif (dest == "y"):
+            self.y = value
+        elif (dest == "isr"):
+            self.isr = value
+        elif (dest == "osr"):
+            self.osr = value
+            self.osrCount = 0
+        elif (dest == "pc"):
+            self.pc = value
+
+    """
+    Private
+
+    Whether a jmp condition holds, decrementing x or y where the condition does.
+
+    Returns:
+        bool: True to jump.
+    """
+    def condition(self, cond):
+        if (cond is None):
+            return True
+        if (cond == "not_x"):
+            return self.x == 0
+        if (cond == "not_y"):
+            return self.y == 0
+        if (cond == "x_dec"):
+            taken = self.x != 0
+            self.x = (self.x - 1) & 0xFFFFFFFF
+            return taken
+        if (cond == "y_dec"):
+            taken = self.y != 0
+            self.y = (self.y - 1) & 0xFFFFFFFF
+            return taken
+        if (cond == "x_not_y"):
+            return self.x != self.y
+        if (cond == "not_osre"):
+            return self.osrCount < self.pullThresh
+        raise ValueError("unsupported jmp condition: " + str(cond))
+
+    """
+    Private
+
+    Execute the instruction at pc.
+
+    Returns:
+        bool: False if the instruction stalled.
+    """
+    def step(self):
+        instruction = self.program.instructions[self.pc]
+        op = instruction.op
+        args = instruction.args
+        nextPc = self.pc + 1 if self.pc != self.program.wrap else self.program.wrapTarget
+
+        if (op == "jmp"):
+            if (len(args) == 1):
+                cond, target = None, args[0]
+            else:
+                cond, target = args
+            if self.condition(cond):
+                nextPc = self.program.labels[target] if isinstance(target, str) else target
+        elif (op == "out"):
+            if (self.autopull and self.osrCount >= self.pullThresh and not self.pull()):
+                return False
+            self.store(args[0], self.shiftOut(args[1]))
+        elif (op == "pull"):
+            block = len(args) == 0 or args[-1] == "block"
+            if not self.pull():
+                if block:
+                    return False
+                self.osr = self.x
+        elif (op == "mov"):
+            self.store(args[0], self.read(args[1]))
+        elif (op == "set"):
+            self.store(args[0], args[1])
+        elif (op != "nop"):
+            raise ValueError("unsupported instruction: " + op)
+
+        self.pc = nextPc
+        return True
+
+    """
+    Run the program.
+
+    Args:
+        maxCycles (int): Stop after this many more cycles.
+
+    Returns:
+        int: The cycle count when the machine stopped.
+    """
+    def run(self, maxCycles):
+        end = self.cycle + maxCycles
+        while self.cycle < end:
+            instruction = self.program.instructions[self.pc]
+
+            # Side-set takes effect on the first cycle, even if the instruction stalls
+            if (instruction.sideValue is not None):
+                self.setPin(instruction.sideValue)
+
+            if not self.step():
+                self.stalled = True
+                return self.cycle
+
+            self.cycle = self.cycle + 1 + instruction.delay
+
+        self.stalled = False
+        return self.cycle
+
+"""
+Write a pin trace as a Value Change Dump.
+
+Args:
+    trace (list): (cycle, level) changes, as recorded by StateMachine.run.
+    path (str): Path of the VCD file.
+    freq (int): State machine frequency, to convert cycles to time.
+    name (str): Name of the signal.
+    endCycle (int): Cycle the dump ends at, or None to end at the last change.
+
+Returns:
+    None
+"""
+def writeVcd(trace, path, freq, name="pin", endCycle=None):
+    with open(path, "w") as f:
+        f.write("$timescale 1ns $end\n")
+        f.write("$scope module pio $end\n")
+        f.write("$var wire 1 " + VCD_ID + " " + name + " $end\n")
+        f.write("$upscope $end\n")
+        f.write("$enddefinitions $end\n")
+        for cycle, level in trace:
+            f.write("#" + str(cycle * 1000000000 // freq) + "\n")
+            f.write(str(level) + VCD_ID + "\n")
+        if (endCycle is not None):
+            f.write("#" + str(endCycle * 1000000000 // freq) + "\n")
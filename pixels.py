@@ -0,0 +1,217 @@
+import array
+
+"""
+Pixels
+======
+
+Pixel output shared by clock.py and Candle.py.
+
+Every backend takes the same frame format: an array("I") with one packed GRB
+value per LED, (green << 16) | (red << 8) | blue, already dimmed. Backends:
+
+ - PioOutput: the ws2812 PIO program, fed by DMA where the firmware provides
+   rp2.DMA so write returns at once, otherwise by StateMachine.put.
+ - NeoPixelOutput: the stock neopixel driver, written straight into its byte buffer.
+ - RecorderOutput: records frames on the host for tests and benchmarks.
+
+makeOutput picks the fastest backend available.
+
+The ws2812 program is written as a plain function and assembled with
+rp2.asm_pio on the Pico; ws2812sim.py runs the same function in the host PIO
+emulator to check its timing.
+"""
+
+try:
+    import rp2
+    from machine import Pin
+    import uctypes
+except ImportError:
+    rp2 = None
+
+try:
+    import neopixel
+except ImportError:
+    neopixel = None
+
+"""
+Pack an RGB color into a GRB frame value.
+
+Args:
+    r (int): Red, 0 to 255.
+    g (int): Green, 0 to 255.
+    b (int): Blue, 0 to 255.
+
+Returns:
+    int: The packed GRB value.
+"""
+def packGRB(r, g, b):
+    return (g<<16) + (r<<8) + b
+
+"""
+Get the DMA request signal paced by a state machine's TX FIFO.
+
+Args:
+    smId (int): StateMachine, 0 to 7.
+
+Returns:
+    int: The DREQ number for the DMA treq_sel.
+"""
+def txDreq(smId):
+    # PIO0 TX FIFOs are DREQ 0 to 3, PIO1 TX FIFOs are DREQ 8 to 11
+    return smId if smId < 4 else smId + 4
+
+# Bits of each 32 bit FIFO word sent per LED, GRB in the top three bytes
+PULL_THRESH = 24
+
+def ws2812Program():
+    T1 = 2
+    T2 = 5
+    T3 = 3
+    wrap_target()
+    label("bitloop")
+    out(x, 1)               .side(0)    [T3 - 1]
+    jmp(not_x, "do_zero")   .side(1)    [T1 - 1]
+    jmp("bitloop")          .side(1)    [T2 - 1]
+    label("do_zero")
+    nop()                   .side(0)    [T2 - 1]
+    wrap()
+
+if rp2:
+    ws2812 = rp2.asm_pio(sideset_init=rp2.PIO.OUT_LOW, out_shiftdir=rp2.PIO.SHIFT_LEFT,
+                         autopull=True, pull_thresh=PULL_THRESH)(ws2812Program)
+
+##############################
+"""
+PioOutput - drive WS2812s from a PIO StateMachine.
+
+Each ring has its own StateMachine and, where available, its own DMA channel.
+
+Attributes:
+    FREQ (int): StateMachine frequency for the ws2812 program.
+    sm (rp2.StateMachine): StateMachine for outputting data.
+    dma (rp2.DMA): DMA channel feeding the StateMachine, or None.
+
+Methods:
+    write(frame): Send a frame.
+"""
+class PioOutput(object):
+
+    FREQ = 8_000_000
+
+    def __init__(self, numLeds, pinNum, smId=0):
+        self.numLeds = numLeds
+
+        # Create the StateMachine with the ws2812 program, outputting on pin
+        self.sm = rp2.StateMachine(smId, ws2812, freq=self.FREQ, sideset_base=Pin(pinNum))
+
+        # Start the StateMachine, it will wait for data on its FIFO.
+        self.sm.active(1)
+
+        try:
+            self.dma = rp2.DMA()
+        except AttributeError:
+            self.dma = None
+
+        if self.dma:
+            # Words sent by DMA hold G, R, B in their top three bytes, ready for the 24 bit
+            # autopull. They are written through a byte view so no large ints are created.
+            self.shifted = array.array("I", [0 for _ in range(numLeds)])
+            self.shiftedBytes = uctypes.bytearray_at(uctypes.addressof(self.shifted), 4 * numLeds)
+
+            self.dma.config(read=self.shifted, write=self.sm, count=numLeds,
+                            ctrl=self.dma.pack_ctrl(size=2, inc_write=False, treq_sel=txDreq(smId)))
+
+    def write(self, frame):
+        if not self.dma:
+            self.sm.put(frame, 8)
+            return
+
+        # The previous frame must be out of the buffer before it is rewritten
+        while self.dma.active():
+            pass
+
+        shiftedBytes = self.shiftedBytes
+        for i in range(self.numLeds):
+            c = frame[i]
+            k = 4 * i
+            shiftedBytes[k + 1] = c & 0xFF
+            shiftedBytes[k + 2] = (c >> 8) & 0xFF
+            shiftedBytes[k + 3] = (c >> 16) & 0xFF
+
+        self.dma.read = self.shifted
+        self.dma.count = self.numLeds
+        self.dma.active(1)
+
+##############################
+"""
+NeoPixelOutput - drive WS2812s with the stock neopixel driver.
+
+The frame is copied straight into the driver's GRB byte buffer rather than
+assigned pixel by pixel as tuples.
+
+Methods:
+    write(frame): Send a frame.
+"""
+class NeoPixelOutput(object):
+
+    def __init__(self, numLeds, pinNum):
+        import machine
+
+        self.numLeds = numLeds
+        self.np = neopixel.NeoPixel(machine.Pin(pinNum), numLeds)
+
+    def write(self, frame):
+        buf = self.np.buf
+        for i in range(self.numLeds):
+            c = frame[i]
+            k = 3 * i
+            buf[k] = (c >> 16) & 0xFF
+            buf[k + 1] = (c >> 8) & 0xFF
+            buf[k + 2] = c & 0xFF
+        self.np.write()
+
+##############################
+"""
+RecorderOutput - record frames on the host.
+
+Attributes:
+    frameCount (int): Number of frames written.
+    last (array.array): Copy of the last frame written.
+    frames (list): Copies of every frame written, if keep is set.
+
+Methods:
+    write(frame): Record a frame.
+"""
+class RecorderOutput(object):
+
+    def __init__(self, numLeds, keep=False):
+        self.numLeds = numLeds
+        self.frameCount = 0
+        self.last = array.array("I", [0 for _ in range(numLeds)])
+        self.frames = [] if keep else None
+
+    def write(self, frame):
+        last = self.last
+        for i in range(self.numLeds):
+            last[i] = frame[i]
+        self.frameCount = self.frameCount + 1
+        if (self.frames is not None):
+            self.frames.append(array.array("I", last))
+
+"""
+Create the fastest pixel output available.
+
+Args:
+    numLeds (int): Number of LEDs.
+    pinNum (int): Pin number for outputting data.
+    smId (int): PIO StateMachine to use, if PIO is available.
+
+Returns:
+    object: A PioOutput, NeoPixelOutput or RecorderOutput.
+"""
+def makeOutput(numLeds, pinNum, smId=0):
+    if rp2:
+        return PioOutput(numLeds, pinNum, smId)
+    if neopixel:
+        return NeoPixelOutput(numLeds, pinNum)
+    return RecorderOutput(numLeds)
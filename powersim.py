@@ -0,0 +1,128 @@
+import sys
+import time
+import datetime
+import hostboard
+
+"""
+Power simulation
+================
+
+Run the clock main loop on the host board through a simulated day and report
+the wakeups and CPU time of every hour.
+
+The room is dark, so the lights are on, from DARK_FROM to DARK_TO and light the
+rest of the day. For each hour the report gives the number of wakeups (passes of
+the main loop), how many of them were idle passes ending in lightsleep, whether
+the ring renderer was left running while idle, how long after the room went dark
+the lights came on, and the host CPU time the passes took. Host CPU time is only
+a guide to the Pico's, but the split between hours shows where the active time
+goes.
+
+Run with:
+    python powersim.py [darkFrom darkTo]
+"""
+
+DARK_FROM = 20
+DARK_TO = 22
+
+DARK = 60000
+LIGHT = 20000
+
+DAY = datetime.datetime(2025, 1, 10)
+
+##############################
+"""
+HourStats class holding the simulated figures for one hour.
+
+Attributes:
+    wakeups (int): Passes of the main loop.
+    idle (int): Passes that ended in lightsleep.
+    rendering (int): Idle passes with the renderer still running.
+    lightsOnMs (int): Time from the room going dark to the lights coming on, or None.
+    cpuMs (float): Host CPU time of the passes, in ms.
+"""
+class HourStats(object):
+
+    def __init__(self):
+        self.wakeups = 0
+        self.idle = 0
+        self.rendering = 0
+        self.lightsOnMs = None
+        self.cpuMs = 0.0
+
+"""
+Simulate the clock.
+
+Args:
+    hours (int): Number of hours to simulate from startHour.
+    darkFrom (int): First hour the room is dark.
+    darkTo (int): Last hour the room is dark.
+    startHour (int): Hour of the day the simulation starts.
+
+Returns:
+    list: HourStats for each simulated hour.
+"""
+def simulate(hours, darkFrom=DARK_FROM, darkTo=DARK_TO, startHour=0):
+    start = DAY + datetime.timedelta(hours=startHour)
+    board = hostboard.install(start)
+    try:
+        import clock
+
+        stats = [HourStats() for _ in range(hours)]
+        end = start + datetime.timedelta(hours=hours)
+        last = [time.process_time(), 0]
+        darkSince = [None]
+
+        def onPass(n, power):
+            hour = stats[last[1]]
+            hour.wakeups = hour.wakeups + 1
+            if power.idle:
+                hour.idle = hour.idle + 1
+                if power.renderer.running:
+                    hour.rendering = hour.rendering + 1
+            if (darkSince[0] is not None and not power.idle):
+                hour.lightsOnMs = board.ms - darkSince[0]
+                darkSince[0] = None
+            now = time.process_time()
+            hour.cpuMs = hour.cpuMs + (now - last[0]) * 1000
+
+            when = board.now()
+            if (when >= end):
+                raise hostboard.StopClock()
+            light = DARK if darkFrom <= when.hour <= darkTo else LIGHT
+            if (light == DARK and board.light != DARK):
+                darkSince[0] = board.ms
+            board.light = light
+            last[1] = int((when - start).total_seconds()) // 3600
+            last[0] = time.process_time()
+
+        board.light = DARK if darkFrom <= startHour <= darkTo else LIGHT
+        hostboard.runClock(clock, 10 ** 9, onPass)
+    finally:
+        hostboard.uninstall()
+
+    return stats
+
+def main():
+    args = sys.argv[1:]
+    darkFrom, darkTo = (int(args[0]), int(args[1])) if args else (DARK_FROM, DARK_TO)
+
+    # The clock prints its own hourly report, keep only the table
+    out = sys.stdout
+    sys.stdout = open("/dev/null" if sys.platform != "win32" else "nul", "w")
+    try:
+        stats = simulate(24, darkFrom, darkTo)
+    finally:
+        sys.stdout.close()
+        sys.stdout = out
+
+    print("hour   wakeups   idle   rendering while idle   lights on after dark s   host CPU ms")
+    for hour, s in enumerate(stats):
+        lightsOn = "" if s.lightsOnMs is None else s.lightsOnMs // 1000
+        print("{:>4} {:>9} {:>6} {:>22} {:>24} {:>13.0f}".format(hour, s.wakeups, s.idle, s.rendering, lightsOn, s.cpuMs))
+    print("total {:>8} {:>6} {:>22} {:>24} {:>13.0f}".format(sum(s.wakeups for s in stats), sum(s.idle for s in stats),
+                                                             sum(s.rendering for s in stats), "",
+                                                             sum(s.cpuMs for s in stats)))
+
+if __name__ == "__main__":
+    main()
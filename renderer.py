@@ -0,0 +1,623 @@
+import array
+import time
+import _thread
+
+"""
+Renderer
+========
+
+Render NeoPixel ring frames on the RP2040's second core.
+
+Core 0 publishes scene commands (tick, fill, markers, rainbow, chase) into
+preallocated slots guarded by a lock. Each kind of command has its own slot and
+a newer command replaces any older one it makes redundant: a tick per second of
+the ring, one marker color, one animation, and a fill that also cancels the
+ticks and animation published before it. However fast core 0 publishes, nothing
+is dropped and the last command of each kind always reaches the ring. Core 1
+runs RingRenderer.run, which takes the waiting commands, applies them to the
+layers of a Compositor in the order fill, markers, animation, ticks, advances
+any running animation one frame at a time, merges the changed pixels into the
+dimmed output frame and writes it to the pixel output.
+
+One renderer can drive several rings, such as an hour ring and a minute ring,
+each with its own commands, compositor and output. addRing hands another
+ring's RingRenderer to the one running on core 1, whose loop updates and
+composes every ring, then writes the outputs back to back. A PioOutput write
+starts its DMA channel and returns, so the rings transmit at the same time and
+the refresh time is that of the longest ring rather than the sum.
+
+Dimming is a 256 entry lookup table per channel value. Changing brightness swaps
+in another precomputed table and redraws the frame, nothing is recomputed.
+
+The ring is drawn as three layers, bottom to top: the background animation, the
+second hand and the markers at 0, 15, 30 and 45 seconds. An animation only draws
+on the background, so the accumulated seconds survive it and reappear as soon as
+it ends. Each layer tracks the range of pixels changed since the last frame and
+only that range is merged, so a tick costs one pixel rather than a full rebuild.
+
+Nothing is allocated once the renderer is running, on either core.
+
+The module only needs array, time and _thread, so it also runs under CPython
+with a pixels.RecorderOutput in place of the PIO output.
+"""
+
+"""
+Map logical seconds onto a ring of any length.
+
+Args:
+    numLeds (int): Number of LEDs in the ring.
+
+Returns:
+    array.array: The first pixel of each second, followed by numLeds.
+"""
+def secondPixels(numLeds):
+    return array.array("H", [sec * numLeds // 60 for sec in range(61)])
+
+"""
+Build a dimming table for a brightness.
+
+Args:
+    scale (int): Brightness as a 16 bit fixed point multiplier.
+
+Returns:
+    bytearray: The dimmed value of every channel value, 0 to 255.
+"""
+def dimTable(scale):
+    return bytearray([(v * scale) >> 16 for v in range(256)])
+
+# sleep_ms only exists in MicroPython
+try:
+    sleep_ms = time.sleep_ms
+except AttributeError:
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+##############################
+"""
+Layer class holding one layer of the ring.
+
+Attributes:
+    pixels (array.array): Packed GRB value of each pixel.
+    opaque (bytearray): 1 where the layer covers the layers below it.
+    dirtyLow (int): First pixel changed since the last compose.
+    dirtyHigh (int): Last pixel changed since the last compose, -1 if none.
+
+Methods:
+    set(i, color): Set a pixel.
+    clear(i): Make a pixel transparent.
+    fill(color): Set every pixel.
+    clearAll(): Make every pixel transparent.
+"""
+class Layer(object):
+
+    def __init__(self, numLeds):
+        self.numLeds = numLeds
+        self.pixels = array.array("I", [0 for _ in range(numLeds)])
+        self.opaque = bytearray(numLeds)
+        self.dirtyLow = numLeds
+        self.dirtyHigh = -1
+
+    def mark(self, low, high):
+        if (low < self.dirtyLow):
+            self.dirtyLow = low
+        if (high > self.dirtyHigh):
+            self.dirtyHigh = high
+
+    def set(self, i, color):
+        self.pixels[i] = color
+        self.opaque[i] = 1
+        self.mark(i, i)
+
+    def clear(self, i):
+        if self.opaque[i]:
+            self.opaque[i] = 0
+            self.mark(i, i)
+
+    def fill(self, color):
+        pixels = self.pixels
+        opaque = self.opaque
+        for i in range(self.numLeds):
+            pixels[i] = color
+            opaque[i] = 1
+        self.mark(0, self.numLeds - 1)
+
+    def clearAll(self):
+        opaque = self.opaque
+        for i in range(self.numLeds):
+            opaque[i] = 0
+        self.mark(0, self.numLeds - 1)
+
+##############################
+"""
+Compositor class to merge the layers into the dimmed output frame.
+
+Attributes:
+    BACKGROUND (int): Index of the background animation layer.
+    SECONDS (int): Index of the second hand layer.
+    MARKERS (int): Index of the 0/15/30/45 marker layer.
+    layers (tuple): The layers, bottom first.
+    frame (array.array): Dimmed output frame.
+    dimTable (bytearray): Dimmed value of every channel value.
+
+Methods:
+    compose(): Merge the changed pixels into the frame.
+    invalidate(): Mark every pixel as changed.
+"""
+class Compositor(object):
+
+    BACKGROUND = 0
+    SECONDS = 1
+    MARKERS = 2
+    LAYER_COUNT = 3
+
+    def __init__(self, numLeds, dimTable):
+        self.numLeds = numLeds
+        self.dimTable = dimTable
+        self.layers = tuple(Layer(numLeds) for _ in range(self.LAYER_COUNT))
+        self.frame = array.array("I", [0 for _ in range(numLeds)])
+
+        # Changed range of each layer, sorted by low end, gathered by compose
+        self.rangeLow = array.array("h", [0 for _ in range(self.LAYER_COUNT)])
+        self.rangeHigh = array.array("h", [0 for _ in range(self.LAYER_COUNT)])
+
+    def invalidate(self):
+        self.layers[self.BACKGROUND].mark(0, self.numLeds - 1)
+
+    """
+    Merge the pixels changed in any layer into the frame. Each pixel takes the
+    color of the top-most layer that covers it, or black.
+
+    Each layer's changed range is merged separately, so a tick at one end of
+    the ring and a marker at the other do not recompose everything between
+    them. Ranges that overlap or touch are merged once.
+
+    Returns:
+        bool: True if any pixel was merged.
+    """
+    def compose(self):
+        rangeLow = self.rangeLow
+        rangeHigh = self.rangeHigh
+
+        # Insertion sort the non-empty ranges by their low end
+        count = 0
+        for layer in self.layers:
+            low = layer.dirtyLow
+            high = layer.dirtyHigh
+            if (high >= low):
+                k = count
+                while k > 0 and rangeLow[k - 1] > low:
+                    rangeLow[k] = rangeLow[k - 1]
+                    rangeHigh[k] = rangeHigh[k - 1]
+                    k = k - 1
+                rangeLow[k] = low
+                rangeHigh[k] = high
+                count = count + 1
+            layer.dirtyLow = self.numLeds
+            layer.dirtyHigh = -1
+
+        if (count == 0):
+            return False
+
+        low = rangeLow[0]
+        high = rangeHigh[0]
+        for k in range(1, count):
+            if (rangeLow[k] > high + 1):
+                self.composeRange(low, high)
+                low = rangeLow[k]
+                high = rangeHigh[k]
+            elif (rangeHigh[k] > high):
+                high = rangeHigh[k]
+        self.composeRange(low, high)
+
+        return True
+
+    """
+    Private
+
+    Merge a range of pixels into the frame.
+
+    Args:
+        low (int): First pixel.
+        high (int): Last pixel.
+
+    Returns:
+        None
+    """
+    def composeRange(self, low, high):
+        layers = self.layers
+        frame = self.frame
+        dim = self.dimTable
+        top = self.LAYER_COUNT - 1
+        for i in range(low, high + 1):
+            c = 0
+            for k in range(top, -1, -1):
+                layer = layers[k]
+                if layer.opaque[i]:
+                    c = layer.pixels[i]
+                    break
+            frame[i] = (dim[(c >> 16) & 0xFF] << 16) + (dim[(c >> 8) & 0xFF] << 8) + dim[c & 0xFF]
+
+##############################
+"""
+RingRenderer class to render NeoPixel ring frames on core 1.
+
+Attributes:
+    NONE (int): No command.
+    TICK (int): Set the pixels for a second on the second hand layer.
+    FILL (int): Clear the second hand and fill the background with a color.
+    RAINBOW (int): Start a rainbow cycle animation on the background.
+    CHASE (int): Start a color chase animation on the background.
+    MARKERS (int): Set the color of the 0/15/30/45 markers, black removes them.
+    FRAME_MS (int): Time between frames, also covers the WS2812 latch time.
+    RAINBOW_FRAMES (int): Number of frames in a rainbow cycle.
+    output (object): Pixel output from pixels.py that frames are written to.
+    compositor (Compositor): The layers and the dimmed output frame.
+    frameCount (int): Number of frames written to the output.
+    rings (tuple): The renderers of every ring this one renders, itself first.
+
+Methods:
+    publish(command, color, arg): Publish a scene command from core 0.
+    tick(color, sec): Publish a tick.
+    fill(color): Publish a fill.
+    markers(color): Publish a change of marker color.
+    rainbow(): Publish a rainbow cycle.
+    chase(color): Publish a color chase.
+    busy(): Whether an animation is running or waiting to start.
+    setDimTable(table): Change the brightness.
+    addRing(renderer): Render another ring from this renderer's loop.
+    start(): Start the render loop on core 1.
+    stop(): Stop the render loop.
+    run(): The render loop.
+"""
+class RingRenderer(object):
+
+    # Scene commands
+    NONE = 0
+    TICK = 1
+    FILL = 2
+    RAINBOW = 3
+    CHASE = 4
+    MARKERS = 5
+
+    FRAME_MS = 10
+    RAINBOW_FRAMES = 255
+
+    # Seconds marked on the marker layer
+    MARKER_SECONDS = (0, 15, 30, 45)
+
+    def __init__(self, output, numLeds, wheelTable, dimTable):
+        self.output = output
+        self.numLeds = numLeds
+        self.wheelTable = wheelTable
+
+        self.secondPixel = secondPixels(numLeds)
+
+        self.compositor = Compositor(numLeds, dimTable)
+        layers = self.compositor.layers
+        self.background = layers[Compositor.BACKGROUND]
+        self.seconds = layers[Compositor.SECONDS]
+        self.markerLayer = layers[Compositor.MARKERS]
+
+        # Command slots, written by core 0 and taken by core 1 under the lock
+        self.lock = _thread.allocate_lock()
+        self.waiting = False
+        self.fillWaiting = False
+        self.fillColor = 0
+        self.markersWaiting = False
+        self.markerColor = 0
+        self.animationWaiting = self.NONE
+        self.animationWaitingColor = 0
+        self.tickColors = array.array("I", [0 for _ in range(60)])
+        self.tickWaiting = bytearray(60)
+        self.ticksWaiting = False
+        self.dimTableWaiting = None
+
+        # Commands being applied by core 1, copied out of the slots under the lock
+        self.taken = array.array("I", [0 for _ in range(6)])
+        self.takenTickColors = array.array("I", [0 for _ in range(60)])
+        self.takenTicks = bytearray(60)
+        self.ticksTaken = False
+        self.dimTableTaken = None
+
+        # Running animation
+        self.animation = self.NONE
+        self.animationColor = 0
+        self.step = 0
+
+        self.running = False
+        self.stopped = True
+        self.frameCount = 0
+
+        # Rings rendered by this renderer's loop, and whether each composed a new frame
+        self.rings = (self,)
+        self.composed = False
+
+    """
+    Publish a scene command for core 1, replacing any waiting command it makes redundant.
+
+    Args:
+        command (int): One of TICK, FILL, MARKERS, RAINBOW or CHASE.
+        color (int): Packed GRB color value.
+        arg (int): Command argument, the second for TICK.
+
+    Returns:
+        None
+    """
+    def publish(self, command, color=0, arg=0):
+        with self.lock:
+            if (command == self.TICK):
+                sec = arg % 60
+                self.tickColors[sec] = color
+                self.tickWaiting[sec] = 1
+                self.ticksWaiting = True
+            elif (command == self.FILL):
+                # The fill clears the second hand and stops any animation, so
+                # ticks and animations published before it are not needed
+                self.fillWaiting = True
+                self.fillColor = color
+                self.animationWaiting = self.NONE
+                if self.ticksWaiting:
+                    tickWaiting = self.tickWaiting
+                    for sec in range(60):
+                        tickWaiting[sec] = 0
+                    self.ticksWaiting = False
+            elif (command == self.MARKERS):
+                self.markersWaiting = True
+                self.markerColor = color
+            else:
+                self.animationWaiting = command
+                self.animationWaitingColor = color
+            self.waiting = True
+
+    def tick(self, color, sec):
+        self.publish(self.TICK, color, sec)
+
+    def fill(self, color):
+        self.publish(self.FILL, color)
+
+    def markers(self, color):
+        self.publish(self.MARKERS, color)
+
+    def rainbow(self):
+        self.publish(self.RAINBOW)
+
+    def chase(self, color):
+        self.publish(self.CHASE, color)
+
+    def busy(self):
+        return self.animation != self.NONE or self.animationWaiting != self.NONE
+
+    """
+    Publish a change of brightness. Core 1 redraws every pixel with the new
+    table on the next frame.
+
+    Args:
+        table (bytearray): Dimming table, see dimTable.
+
+    Returns:
+        None
+    """
+    def setDimTable(self, table):
+        with self.lock:
+            self.dimTableWaiting = table
+            self.waiting = True
+
+    """
+    Private
+
+    Copy the waiting commands out of the slots and empty them.
+
+    Returns:
+        bool: False if no command was waiting.
+    """
+    def takeCommands(self):
+        if not self.waiting:
+            return False
+
+        taken = self.taken
+        with self.lock:
+            taken[0] = self.fillWaiting
+            taken[1] = self.fillColor
+            taken[2] = self.markersWaiting
+            taken[3] = self.markerColor
+            taken[4] = self.animationWaiting
+            taken[5] = self.animationWaitingColor
+            self.dimTableTaken = self.dimTableWaiting
+            self.dimTableWaiting = None
+            self.fillWaiting = False
+            self.markersWaiting = False
+            self.animationWaiting = self.NONE
+
+            self.ticksTaken = self.ticksWaiting
+            if self.ticksWaiting:
+                tickWaiting = self.tickWaiting
+                tickColors = self.tickColors
+                takenTicks = self.takenTicks
+                takenTickColors = self.takenTickColors
+                for sec in range(60):
+                    takenTicks[sec] = tickWaiting[sec]
+                    takenTickColors[sec] = tickColors[sec]
+                    tickWaiting[sec] = 0
+                self.ticksWaiting = False
+
+            self.waiting = False
+
+        return True
+
+    """
+    Private
+
+    Apply the taken commands to the layers.
+
+    Returns:
+        None
+    """
+    def apply(self):
+        taken = self.taken
+
+        if (self.dimTableTaken is not None):
+            self.compositor.dimTable = self.dimTableTaken
+            self.compositor.invalidate()
+            self.dimTableTaken = None
+
+        if taken[0]:
+            color = taken[1]
+            self.animation = self.NONE
+            self.seconds.clearAll()
+            if color:
+                self.background.fill(color)
+            else:
+                self.background.clearAll()
+
+        if taken[2]:
+            color = taken[3]
+            for sec in self.MARKER_SECONDS:
+                i = self.secondPixel[sec]
+                if color:
+                    self.markerLayer.set(i, color)
+                else:
+                    self.markerLayer.clear(i)
+
+        if (taken[4] != self.NONE):
+            self.animation = taken[4]
+            self.animationColor = taken[5]
+            self.step = 0
+
+        if self.ticksTaken:
+            takenTicks = self.takenTicks
+            takenTickColors = self.takenTickColors
+            secondPixel = self.secondPixel
+            for sec in range(60):
+                if takenTicks[sec]:
+                    color = takenTickColors[sec]
+                    for i in range(secondPixel[sec], secondPixel[sec + 1]):
+                        self.seconds.set(i, color)
+
+    """
+    Private
+
+    Advance the running animation on the background by one frame.
+
+    Returns:
+        None
+    """
+    def animate(self):
+        background = self.background
+        n = self.numLeds
+        j = self.step
+
+        if (self.animation == self.RAINBOW):
+            wheelTable = self.wheelTable
+            pixels = background.pixels
+            opaque = background.opaque
+            for i in range(n):
+                pixels[i] = wheelTable[((i * 256 // n) + j) & 255]
+                opaque[i] = 1
+            background.mark(0, n - 1)
+            last = self.RAINBOW_FRAMES - 1
+        else:
+            background.clear(n - 1 if (j == 0) else j - 1)
+            background.set(j, self.animationColor)
+            last = n - 1
+
+        if (j >= last):
+            # Uncover the layers below once the animation ends
+            self.animation = self.NONE
+            background.clearAll()
+        else:
+            self.step = j + 1
+
+    """
+    Render another ring from this renderer's loop, so one core drives every
+    ring. The other renderer is not started; commands are still published to
+    it. Rings are added before start.
+
+    Args:
+        renderer (RingRenderer): The renderer of the other ring.
+
+    Returns:
+        None
+    """
+    def addRing(self, renderer):
+        self.rings = self.rings + (renderer,)
+
+    """
+    Private
+
+    Apply this ring's waiting commands and advance its animation by one frame.
+
+    Returns:
+        None
+    """
+    def update(self):
+        if self.takeCommands():
+            self.apply()
+
+        if (self.animation != self.NONE):
+            self.animate()
+
+    """
+    Private
+
+    Merge the changed pixels of every ring into its frame, then write the
+    frames that changed back to back, so the rings transmit together.
+
+    Returns:
+        None
+    """
+    def render(self):
+        rings = self.rings
+        for ring in rings:
+            ring.composed = ring.compositor.compose()
+
+        for ring in rings:
+            if ring.composed:
+                ring.output.write(ring.compositor.frame)
+                ring.frameCount = ring.frameCount + 1
+
+    """
+    Start the render loop on another core.
+
+    Returns:
+        None
+    """
+    def start(self):
+        self.running = True
+        self.stopped = False
+        _thread.start_new_thread(self.run, ())
+
+    """
+    Stop the render loop and wait for it to finish. Commands published before
+    the stop are still shown.
+
+    Returns:
+        None
+    """
+    def stop(self):
+        self.running = False
+        while not self.stopped:
+            sleep_ms(1)
+
+    """
+    The render loop, run on core 1.
+
+    Returns:
+        None
+    """
+    def run(self):
+        rings = self.rings
+        while self.running:
+            for ring in rings:
+                ring.update()
+
+            self.render()
+
+            sleep_ms(self.FRAME_MS)
+
+        # Show the commands published just before the stop, such as a fill switching the ring off
+        for ring in rings:
+            if ring.takeCommands():
+                ring.apply()
+        self.render()
+
+        self.stopped = True
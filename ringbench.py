@@ -0,0 +1,66 @@
+import time
+from renderer import RingRenderer, dimTable
+from pixels import RecorderOutput
+
+"""
+Ring benchmark
+==============
+
+Host benchmark of NeoPixel ring frame time against LED count.
+
+For each ring size the compositor is timed on the host, both merging a full frame
+(as during a rainbow) and merging the single pixel changed by a tick. The time to
+clock the frame out of the ws2812 PIO program is calculated: the program runs at
+8 MHz and takes T1 + T2 + T3 = 10 cycles per bit, so each LED takes
+24 * 1.25 = 30 us.
+
+Two rings, an hour ring and a minute ring, are timed through one renderer
+driving both, as on core 1: full frames of both rings are merged and written
+back to back. On the Pico each write only starts a DMA channel, so the two
+frames then go out on the wire together.
+
+Run with:
+    python ringbench.py
+"""
+
+LED_COUNTS = (60, 120, 144, 240)
+FRAMES = 200
+
+# ws2812 program timing
+PIO_FREQ = 8_000_000
+CYCLES_PER_BIT = 10
+BITS_PER_LED = 24
+LATCH_US = 50
+
+def wireTimeUs(numLeds):
+    return numLeds * BITS_PER_LED * CYCLES_PER_BIT * 1_000_000 // PIO_FREQ + LATCH_US
+
+def makeRenderer(numLeds):
+    return RingRenderer(RecorderOutput(numLeds), numLeds, [pos for pos in range(256)], dimTable(6553))
+
+def renderTimeUs(numLeds, fullFrame, ringCount=1):
+    renderer = makeRenderer(numLeds)
+    for ring in range(ringCount - 1):
+        renderer.addRing(makeRenderer(numLeds))
+
+    start = time.perf_counter()
+    for frame in range(FRAMES):
+        for ring in renderer.rings:
+            if fullFrame:
+                ring.compositor.invalidate()
+            else:
+                ring.seconds.set(frame % numLeds, 0xFFFFFF)
+        renderer.render()
+    return (time.perf_counter() - start) * 1_000_000 / FRAMES
+
+def main():
+    print("LEDs   full frame us   tick frame us   wire us   2 rings full frame us")
+    for numLeds in LED_COUNTS:
+        full = renderTimeUs(numLeds, True)
+        tick = renderTimeUs(numLeds, False)
+        wire = wireTimeUs(numLeds)
+        both = renderTimeUs(numLeds, True, 2)
+        print("{:>4} {:>15.1f} {:>15.1f} {:>9} {:>23.1f}".format(numLeds, full, tick, wire, both))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Schedule
+========
+
+Compile a declarative set of daily rules into a per-minute lookup table.
+
+Each rule is a tuple (action, firstHour, lastHour, minutes, strikes):
+ - action: one of the Schedule action flags.
+ - firstHour, lastHour: the hours (inclusive) the rule applies to. If firstHour is
+   greater than lastHour the range wraps past midnight.
+ - minutes: the minutes of each hour the rule applies to, or None for every minute.
+ - strikes: for CHIME, the number of strikes, or STRIKE_HOUR to strike the hour.
+
+QUIET rules are applied after all the others and remove CHIME from their minutes,
+whatever order the rules are given in.
+
+The rules are compiled once into a 1440 entry bytearray of action flags and a
+1440 entry bytearray of strike counts, so looking up what to do in any minute is
+a single index.
+"""
+
+##############################
+"""
+Schedule class holding the compiled per-minute actions.
+
+Attributes:
+    ACTIVE (int): The ring, star and candles may be lit.
+    CHASE (int): Run the colour chase.
+    RAINBOW (int): Run the rainbow cycle.
+    CHIME (int): Chime.
+    QUIET (int): Rule action that silences chimes.
+    STRIKE_HOUR (int): Strike count meaning strike the hour, 1 to 12.
+    flags (bytearray): Action flags for each minute of the day.
+    strikes (bytearray): Strike count for each minute of the day.
+
+Methods:
+    actions(hour, minute): Get the action flags for a minute.
+    strikeCount(hour, minute): Get the number of strikes for a minute.
+"""
+class Schedule(object):
+
+    ACTIVE = 1
+    CHASE = 2
+    RAINBOW = 4
+    CHIME = 8
+    QUIET = 16
+
+    STRIKE_HOUR = 0
+
+    MINUTES_PER_DAY = 1440
+
+    def __init__(self, rules):
+        self.flags = bytearray(self.MINUTES_PER_DAY)
+        self.strikes = bytearray(self.MINUTES_PER_DAY)
+
+        for rule in rules:
+            if (rule[0] != self.QUIET):
+                self.compileRule(rule)
+
+        for rule in rules:
+            if (rule[0] == self.QUIET):
+                self.compileRule(rule)
+
+    """
+    Private
+
+    Set or clear the flags of every minute a rule applies to.
+
+    Args:
+        rule (tuple): (action, firstHour, lastHour, minutes, strikes)
+
+    Returns:
+        None
+    """
+    def compileRule(self, rule):
+        action, firstHour, lastHour, minutes, strikes = rule
+
+        hours = (lastHour - firstHour) % 24 + 1
+        if (minutes is None):
+            minutes = range(60)
+
+        for h in range(hours):
+            hour = (firstHour + h) % 24
+            for minute in minutes:
+                i = hour * 60 + minute
+                if (action == self.QUIET):
+                    self.flags[i] = self.flags[i] & ~self.CHIME
+                    self.strikes[i] = 0
+                else:
+                    self.flags[i] = self.flags[i] | action
+
+                if (action == self.CHIME):
+                    if (strikes == self.STRIKE_HOUR):
+                        self.strikes[i] = hour % 12 or 12
+                    else:
+                        self.strikes[i] = strikes
+
+    def actions(self, hour, minute):
+        return self.flags[hour * 60 + minute]
+
+    def strikeCount(self, hour, minute):
+        return self.strikes[hour * 60 + minute]
@@ -0,0 +1,300 @@
+import struct
+import sys
+
+"""
+Sensor log
+==========
+
+Compact binary log of temperature, humidity and light level on the Pico's flash filesystem.
+
+The log is a preallocated ring file: a header padded to one filesystem block,
+followed by record blocks holding CAPACITY fixed size records, rounded up to
+whole blocks. Once the ring is full the oldest block of records is overwritten.
+
+Header (written once, when the file is created):
+    magic (4s): b"SLOG"
+    version (H): format version
+    recordSize (H): bytes per record
+    capacity (I): number of records in the ring
+    blockSize (I): filesystem block size the file is laid out for
+
+Block header (8 bytes, little endian, the first record slot of each block):
+    sequence (I): incremented for every new block, 0 for a block never written
+    count (H): number of records in the block
+    reserved (H): 0
+
+Record (8 bytes, little endian):
+    stamp (I): minutes since 2000-01-01 00:00
+    temperature (b): degrees C
+    humidity (B): percent
+    light (H): raw light level
+
+The block size is read from the filesystem (4096 bytes on the Pico's LittleFS).
+Records are buffered in RAM a block at a time and every write is one whole,
+block aligned block, so LittleFS rewrites a single block per flush rather than
+copying a partly written one. With one record a minute that is one write every
+8.5 hours. The file header is never rewritten: the next record to write is
+found at start-up from the block with the highest sequence number and its
+count. The stamps are only data, so setting the clock back, or a DS1302 that
+lost its battery, does not disturb the order of the log.
+
+The module also runs on the host to decode a log copied off the Pico:
+    python sensorlog.py sensors.log
+"""
+
+HEADER_FORMAT = "<4sHHII"
+HEADER_SIZE = 16
+MAGIC = b"SLOG"
+VERSION = 3
+
+RECORD_FORMAT = "<IbBH"
+RECORD_SIZE = 8
+
+BLOCK_HEADER_FORMAT = "<IHH"
+
+# Block size used where the filesystem does not report one
+DEFAULT_BLOCK_SIZE = 4096
+
+# A week of one minute records
+CAPACITY = 7 * 1440
+
+"""
+Get the block size of the filesystem holding the log.
+
+Returns:
+    int: Block size in bytes.
+"""
+def flashBlockSize():
+    try:
+        import os
+        return os.statvfs("/")[0]
+    except (AttributeError, OSError):
+        return DEFAULT_BLOCK_SIZE
+
+"""
+Convert a date and time into minutes since 2000-01-01 00:00.
+
+Args:
+    year (int): The year.
+    month (int): The month, 1 to 12.
+    day (int): The day, 1 to 31.
+    hour (int): The hour.
+    minute (int): The minute.
+
+Returns:
+    int: Minutes since 2000-01-01 00:00.
+"""
+def minuteStamp(year, month, day, hour, minute):
+    # Days since 2000-01-01 using the days-from-civil algorithm
+    if (month <= 2):
+        year = year - 1
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 730425
+    return (days * 24 + hour) * 60 + minute
+
+##############################
+"""
+SensorLog class to append sensor records to a ring file on flash.
+
+Attributes:
+    path (str): Path of the log file.
+    blockSize (int): Filesystem block size, the unit every write is made in.
+    blockRecords (int): Number of records in a block, after its header.
+    capacity (int): Number of records in the ring, a whole number of blocks.
+    block (int): Index of the block being filled.
+    sequence (int): Sequence number of the block being filled.
+    head (int): Index of the next record to write to the file.
+    buffer (bytearray): The block being filled, as it will be written.
+    buffered (int): Number of records in the buffer.
+
+Methods:
+    append(stamp, temperature, humidity, light): Buffer a record.
+    flush(): Write the buffered block to flash.
+"""
+class SensorLog(object):
+
+    def __init__(self, path, capacity=CAPACITY, blockSize=None):
+        self.path = path
+        self.blockSize = blockSize or flashBlockSize()
+        self.blockRecords = self.blockSize // RECORD_SIZE - 1
+        self.blocks = (capacity + self.blockRecords - 1) // self.blockRecords
+        self.capacity = self.blocks * self.blockRecords
+        self.buffer = bytearray(self.blockSize)
+        self.header = bytearray(HEADER_SIZE)
+
+        try:
+            with open(path, "rb") as f:
+                if (f.readinto(self.header) != HEADER_SIZE):
+                    raise OSError("short header")
+                magic, version, recordSize, fileCapacity, fileBlockSize = struct.unpack(HEADER_FORMAT, self.header)
+                valid = (magic == MAGIC and version == VERSION and recordSize == RECORD_SIZE and
+                         fileCapacity == self.capacity and fileBlockSize == self.blockSize)
+                if valid:
+                    block, sequence, count = findNewest(f, self.blockSize, self.blocks, self.buffer)
+                    if (sequence == 0 or count == self.blockRecords):
+                        # Nothing written yet, or the newest block is full
+                        self.startBlock((block + 1) % self.blocks if sequence else 0, sequence + 1)
+                    else:
+                        # Carry on filling the newest block
+                        f.seek(self.blockSize * (block + 1))
+                        f.readinto(self.buffer)
+                        self.block = block
+                        self.sequence = sequence
+                        self.buffered = count
+                        self.head = block * self.blockRecords + count
+        except OSError:
+            valid = False
+
+        if not valid:
+            self.create()
+
+    """
+    Private
+
+    Create the log file at its full size so later writes never grow it.
+
+    Returns:
+        None
+    """
+    def create(self):
+        self.buffer[:] = bytes(self.blockSize)
+        struct.pack_into(HEADER_FORMAT, self.header, 0, MAGIC, VERSION, RECORD_SIZE, self.capacity, self.blockSize)
+        with open(self.path, "wb") as f:
+            f.write(self.header)
+            f.write(bytearray(self.blockSize - HEADER_SIZE))
+            for i in range(self.blocks):
+                f.write(self.buffer)
+        self.startBlock(0, 1)
+
+    """
+    Private
+
+    Start filling an empty block.
+
+    Args:
+        block (int): Index of the block.
+        sequence (int): Its sequence number.
+
+    Returns:
+        None
+    """
+    def startBlock(self, block, sequence):
+        self.block = block
+        self.sequence = sequence
+        self.buffered = 0
+        self.head = block * self.blockRecords
+        self.buffer[:] = bytes(self.blockSize)
+
+    """
+    Buffer a record, writing the buffer to flash once a block is full.
+
+    Args:
+        stamp (int): Minutes since 2000-01-01 00:00, see minuteStamp.
+        temperature (int): Temperature in degrees C.
+        humidity (int): Humidity in percent.
+        light (int): Raw light level, 0 to 65535.
+
+    Returns:
+        None
+    """
+    def append(self, stamp, temperature, humidity, light):
+        self.buffered = self.buffered + 1
+        struct.pack_into(RECORD_FORMAT, self.buffer, self.buffered * RECORD_SIZE,
+                         stamp, temperature, humidity, light)
+        self.head = self.head + 1
+
+        if (self.buffered == self.blockRecords):
+            self.flush()
+
+    """
+    Write the buffered block to flash. A partly filled block is written with
+    its count, and filled further by later appends.
+
+    Returns:
+        None
+    """
+    def flush(self):
+        if (self.buffered == 0):
+            return
+
+        struct.pack_into(BLOCK_HEADER_FORMAT, self.buffer, 0, self.sequence, self.buffered, 0)
+        with open(self.path, "r+b") as f:
+            f.seek(self.blockSize * (self.block + 1))
+            f.write(self.buffer)
+
+        # A full block is done with, the next one starts empty
+        if (self.buffered == self.blockRecords):
+            self.startBlock((self.block + 1) % self.blocks, self.sequence + 1)
+
+"""
+Find the newest block in a log file, the one with the highest sequence number.
+
+Args:
+    f (file): The log file.
+    blockSize (int): Block size the file is laid out for.
+    blocks (int): Number of record blocks.
+    chunk (bytearray): Buffer to read the block headers into.
+
+Returns:
+    tuple: (block, sequence, count), sequence 0 if no block was written.
+"""
+def findNewest(f, blockSize, blocks, chunk):
+    newest = (0, 0, 0)
+    for block in range(blocks):
+        f.seek(blockSize * (block + 1))
+        f.readinto(memoryview(chunk)[:RECORD_SIZE])
+        sequence, count, reserved = struct.unpack_from(BLOCK_HEADER_FORMAT, chunk, 0)
+        if (sequence > newest[1]):
+            newest = (block, sequence, count)
+    return newest
+
+"""
+Read the records in a log file, oldest first, without loading the file into memory.
+
+Args:
+    path (str): Path of the log file.
+
+Yields:
+    tuple: (stamp, temperature, humidity, light)
+"""
+def records(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+        magic, version, recordSize, capacity, blockSize = struct.unpack(HEADER_FORMAT, header)
+        if (magic != MAGIC or version != VERSION or recordSize != RECORD_SIZE):
+            raise ValueError("not a sensor log: " + path)
+
+        chunk = bytearray(blockSize)
+        blocks = capacity // (blockSize // RECORD_SIZE - 1)
+        newest = findNewest(f, blockSize, blocks, chunk)[0]
+
+        # Blocks are written round the ring, so the oldest follows the newest
+        for n in range(1, blocks + 1):
+            f.seek(blockSize * ((newest + n) % blocks + 1))
+            f.readinto(chunk)
+            sequence, count, reserved = struct.unpack_from(BLOCK_HEADER_FORMAT, chunk, 0)
+            if sequence:
+                for i in range(1, count + 1):
+                    yield struct.unpack_from(RECORD_FORMAT, chunk, i * RECORD_SIZE)
+
+"""
+Decode a log file copied off the Pico and print it as CSV.
+"""
+def main():
+    import datetime
+
+    if (len(sys.argv) != 2):
+        print("usage: python sensorlog.py <log file>")
+        return
+
+    epoch = datetime.datetime(2000, 1, 1)
+    print("time,temperature,humidity,light")
+    for stamp, temperature, humidity, light in records(sys.argv[1]):
+        when = epoch + datetime.timedelta(minutes=stamp)
+        print("{},{},{},{}".format(when.strftime("%Y-%m-%d %H:%M"), temperature, humidity, light))
+
+if __name__ == "__main__":
+    main()
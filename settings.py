@@ -0,0 +1,173 @@
+import struct
+import time
+
+"""
+Settings
+========
+
+Small settings store on the flash filesystem.
+
+Each setting is one byte. Changes are kept in RAM and only written once no
+setting has changed for QUIET_MS, and no more often than MIN_INTERVAL_MS, so
+button presses and settings that change every minute never cause a synchronous
+flash write in the main loop. A change to one of the urgent settings, those the
+user sets with a button, is written after QUIET_MS whatever the time since the
+last write, so it survives a power cut soon after.
+
+Writes rotate round SLOTS files. Each record carries a sequence number and a
+Fletcher-16 checksum; at load the valid record with the highest sequence wins,
+so a write torn by a power cut only loses that write and the previous slot is
+used instead.
+
+Record (little endian):
+    magic (4s): b"CLKS"
+    sequence (I): incremented on every write
+    length (H): number of setting bytes
+    checksum (H): Fletcher-16 of the setting bytes
+    values: one byte per setting
+"""
+
+# ticks_ms only exists in MicroPython
+try:
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+HEADER_FORMAT = "<4sIHH"
+HEADER_SIZE = 12
+MAGIC = b"CLKS"
+
+"""
+Fletcher-16 checksum.
+
+Args:
+    data (bytearray): The bytes to check.
+
+Returns:
+    int: The 16 bit checksum.
+"""
+def fletcher16(data):
+    a = 0
+    b = 0
+    for byte in data:
+        a = (a + byte) % 255
+        b = (b + a) % 255
+    return (b << 8) | a
+
+##############################
+"""
+SettingsStore class holding one byte settings persisted to flash.
+
+Attributes:
+    SLOTS (int): Number of files the writes rotate round.
+    QUIET_MS (int): Time with no changes before a write.
+    MIN_INTERVAL_MS (int): Minimum time between writes.
+    names (tuple): Setting names, in storage order.
+    urgent (tuple): Names of the settings written without waiting for MIN_INTERVAL_MS.
+    values (bytearray): Current setting values.
+    sequence (int): Sequence number of the last record written or loaded.
+    loadMs (int): Time taken to load the settings at start-up.
+
+Methods:
+    get(name): Get a setting.
+    set(name, value): Change a setting in RAM.
+    poll(): Write pending changes if the quiet period has passed.
+    flush(): Write pending changes now.
+"""
+class SettingsStore(object):
+
+    SLOTS = 3
+    QUIET_MS = 5000
+    MIN_INTERVAL_MS = 10 * 60 * 1000
+
+    def __init__(self, prefix, names, defaults, urgent=()):
+        self.prefix = prefix
+        self.names = names
+        self.urgent = urgent
+        self.values = bytearray(defaults)
+        self.record = bytearray(HEADER_SIZE + len(names))
+        self.sequence = 0
+        self.slot = self.SLOTS - 1
+        self.dirty = False
+        self.dirtyUrgent = False
+        self.changedMs = 0
+        self.flushedMs = None
+
+        start = ticks_ms()
+        self.load()
+        self.loadMs = ticks_diff(ticks_ms(), start)
+
+    def path(self, slot):
+        return self.prefix + str(slot) + ".bin"
+
+    """
+    Private
+
+    Load the newest valid record from the slots, keeping the defaults if there is none.
+
+    Returns:
+        None
+    """
+    def load(self):
+        record = self.record
+        for slot in range(self.SLOTS):
+            try:
+                with open(self.path(slot), "rb") as f:
+                    if (f.readinto(record) != len(record)):
+                        continue
+            except OSError:
+                continue
+
+            magic, sequence, length, checksum = struct.unpack_from(HEADER_FORMAT, record, 0)
+            values = memoryview(record)[HEADER_SIZE:]
+            if (magic != MAGIC or length != len(self.names) or checksum != fletcher16(values)):
+                continue
+
+            if (sequence >= self.sequence):
+                self.sequence = sequence
+                self.slot = slot
+                self.values[:] = values
+
+    def get(self, name):
+        return self.values[self.names.index(name)]
+
+    def set(self, name, value):
+        i = self.names.index(name)
+        if (self.values[i] != value):
+            self.values[i] = value
+            self.dirty = True
+            self.dirtyUrgent = self.dirtyUrgent or name in self.urgent
+            self.changedMs = ticks_ms()
+
+    def poll(self):
+        if not self.dirty:
+            return
+
+        now = ticks_ms()
+        if (ticks_diff(now, self.changedMs) < self.QUIET_MS):
+            return
+        if (not self.dirtyUrgent and self.flushedMs is not None and
+                ticks_diff(now, self.flushedMs) < self.MIN_INTERVAL_MS):
+            return
+
+        self.flush()
+
+    def flush(self):
+        self.sequence = self.sequence + 1
+        self.slot = (self.slot + 1) % self.SLOTS
+
+        record = self.record
+        struct.pack_into(HEADER_FORMAT, record, 0, MAGIC, self.sequence, len(self.names), fletcher16(self.values))
+        record[HEADER_SIZE:] = self.values
+
+        with open(self.path(self.slot), "wb") as f:
+            f.write(record)
+
+        self.dirty = False
+        self.dirtyUrgent = False
+        self.flushedMs = ticks_ms()
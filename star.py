@@ -1,78 +1,57 @@
-from machine import Pin, PWM
-from time import sleep
+from time import sleep, ticks_us, ticks_diff
+from lightstar import LightStar
 
-##############################
 """
-LightStar - interface to RGB LED
-
-Methods:
-    illuminate
+Star
+====
+
+Demo of the LightStar fading through the hourly colours, which doubles as a
+benchmark of the fade engine. It first times one fade update with all three
+channels fading, giving the highest update rate the CPU could sustain, then
+prints the number of timer updates each hourly fade took against the number
+expected at the fade rate.
 """
-class LightStar(object):
-
-    def __init__(self): 
-        # Initialize PWM for each color channel of an RGB LED
-        self.red = PWM(Pin(2))  # Red channel on GPIO pin 26
-        self.green = PWM(Pin(6))  # Green channel on GPIO pin 27
-        self.blue = PWM(Pin(7))  # Blue channel on GPIO pin 28
-
-        # Set 1000 Hz frequency for all channels
-        self.red.freq(1000)
-        self.green.freq(1000)
-        self.blue.freq(1000)
-        
-        self.MAX_BRIGHTNESS = 65535
-        self.MIN_BRIGHTNESS = 5535
-
-    # Function to set RGB LED color
-    def light(self, r, g, b):
-        self.red.duty_u16(r)  # Red intensity
-        self.green.duty_u16(g)  # Green intensity
-        self.blue.duty_u16(b)  # Blue intensity
-
-    # Method to set RGB LED color
-    def off(self):
-        self.light(0, 0, 0)  # White
-        
-    # Method to set RGB LED color
-    def illuminate(self, hour):
-                  
-        MULTIPLIER = 3600
-        greenBrightness = 32000
-        
-        redBrightness = (hour * MULTIPLIER) +  20000
-        
-        hour  = abs(hour - 23)
-        blueBrightness = abs((hour * MULTIPLIER) - 10000)
-        
-        if (redBrightness >= self.MAX_BRIGHTNESS):
-            redBrightness = self.MAX_BRIGHTNESS
-            
-        if (blueBrightness >= self.MAX_BRIGHTNESS):
-            blueBrightness = 0           
-          
-        print("Red Brightness: " + str(redBrightness))
-        print("Blue Brightness: " + str(blueBrightness))
-        
-        self.light(redBrightness, greenBrightness, blueBrightness)  
+
+BENCH_UPDATES = 1000
+
+# Time one update of the fade engine with every channel fading
+def benchmark(fader):
+    for channel in range(fader.count):
+        fader.fadeTo(channel, 65535 * (channel & 1), 2 * BENCH_UPDATES * 1000 // fader.rateHz)
+    fader.stop()
+
+    start = ticks_us()
+    for i in range(BENCH_UPDATES):
+        fader.update()
+    us = ticks_diff(ticks_us(), start) / BENCH_UPDATES
+
+    print("Fade update: {:.1f} us, at most {} updates per second".format(us, int(1000000 / us)))
+    print("Fade rate: {} updates per second, {:.2f}% of the CPU".format(fader.rateHz, us * fader.rateHz / 10000))
 
 
 def main():
-    
+
     lightStar = LightStar()
+    fader = lightStar.startFader()
+
+    benchmark(fader)
+
     hour = 0
-    
+    expected = lightStar.fadeMs * fader.rateHz // 1000
+
     while True:
+        updates = fader.updates
         lightStar.illuminate(hour)
         hour = hour + 1
-        
-        print(hour)
+
         if (hour == 23):
            hour = 0
-           
+
         sleep(0.5)
-    
-    
-    
+
+        print(hour, "fade updates:", fader.updates - updates, "expected:", expected)
+
+
+
 if __name__ == "__main__":
-    main()     
\ No newline at end of file
+    main()
@@ -0,0 +1,22 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+# The modules under test live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hostboard
+
+"""
+The simulated board, with the fake hardware installed for the test. The RTC
+starts at noon unless the test passes another start time:
+
+    @pytest.mark.parametrize("board", [datetime.datetime(...)], indirect=True)
+"""
+@pytest.fixture
+def board(request):
+    board = hostboard.install(getattr(request, "param", datetime.datetime(2025, 1, 10, 12, 0, 0)))
+    yield board
+    hostboard.uninstall()
@@ -0,0 +1,27 @@
+import datetime
+
+import hostboard
+from schedule import Schedule
+
+"""
+A rule set with a single chime minute a day must chime on every day, not only
+the first.
+"""
+
+def test_single_daily_chime_repeats_every_day(board, monkeypatch):
+    import clock
+
+    monkeypatch.setattr(clock, "CLOCK_RULES", ((Schedule.CHIME, 12, 12, (12,), Schedule.STRIKE_HOUR),))
+    chimes = []
+    monkeypatch.setattr(clock.ServoMotor, "hourlyChime",
+                        lambda servo, strikes, volume: chimes.append((board.now().day, strikes)))
+
+    end = board.now() + datetime.timedelta(days=2, minutes=20)
+
+    def onPass(n, power):
+        if (board.now() > end):
+            raise hostboard.StopClock()
+
+    hostboard.runClock(clock, 10 ** 9, onPass)
+
+    assert chimes == [(10, 12), (11, 12), (12, 12)]
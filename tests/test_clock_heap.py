@@ -0,0 +1,56 @@
+import array
+import datetime
+import tracemalloc
+
+import pytest
+
+import hostboard
+
+"""
+Run the clock main loop on the host board for thousands of passes and check
+that the heap stays flat once every subsystem has been used.
+
+The board powers up in the dark at 21:55 and the room then stays dark for 6
+minutes out of every 15. The warm-up passes cover the rainbow at 21:59, the
+chime at 22:00, the chase at 22:44, the history page, the candles and ring
+switching on and off, idle lightsleeps and settings writes. The measured passes
+run through the night into the next evening. Over them the traced heap must not
+grow, so nothing is kept per pass.
+
+Only the heap kept is measured: CPython allocates short-lived integers where
+MicroPython does not, so objects a pass creates and frees are not counted.
+"""
+
+WARMUP_PASSES = 3000
+MEASURED_PASSES = 2500
+
+# The hourly power report fills a few KB of stdout buffer; keeping even one
+# small object per pass would add tens of KB
+MAX_GROWTH_BYTES = 12 * 1024
+
+DARK = 60000
+LIGHT = 20000
+
+@pytest.mark.parametrize("board", [datetime.datetime(2025, 1, 10, 21, 55, 0)], indirect=True)
+def test_heap_is_flat(board):
+    import clock
+
+    board.light = DARK
+
+    # Preallocated, so recording a sample does not grow the heap being measured
+    samples = array.array("q", [0 for _ in range(MEASURED_PASSES)])
+
+    def onPass(n, power):
+        board.light = DARK if (board.now().minute + 5) % 15 < 6 else LIGHT
+        if (n >= WARMUP_PASSES):
+            samples[n - WARMUP_PASSES] = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.start()
+    try:
+        hostboard.runClock(clock, WARMUP_PASSES + MEASURED_PASSES, onPass)
+    finally:
+        tracemalloc.stop()
+
+    assert board.now() > datetime.datetime(2025, 1, 11, 9, 0)
+    assert samples[-1] - samples[0] < MAX_GROWTH_BYTES
+    assert max(samples) - samples[0] < MAX_GROWTH_BYTES
@@ -0,0 +1,25 @@
+import powersim
+
+"""
+A simulated hour with the lights on followed by an hour of daylight. Once the
+light has held for the dwell time the clock idles, and every idle pass
+lightsleeps until the next minute with the ring renderer stopped.
+"""
+
+def test_idle_hour_wakes_once_a_minute():
+    active, idle = powersim.simulate(2, darkFrom=21, darkTo=21, startHour=21)
+
+    assert active.wakeups > 7000
+    assert active.idle == 0
+    # The last idle minute can fall on either side of the hour
+    assert 59 <= idle.idle <= 60
+    assert idle.wakeups - idle.idle < 20
+    assert idle.rendering == 0
+
+def test_lights_come_on_at_the_first_wake_after_dark():
+    light, dark = powersim.simulate(2, darkFrom=21, darkTo=21, startHour=20)
+
+    # The clock idles through the light hour and wakes once a minute
+    assert light.idle >= 59
+    assert dark.lightsOnMs is not None
+    assert dark.lightsOnMs <= 61 * 1000
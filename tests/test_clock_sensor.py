@@ -0,0 +1,34 @@
+import hostboard
+
+"""
+The DHT11 stays off the boot path: it is not touched until it has had time to
+start, and a failed measurement never reaches the main loop.
+"""
+
+def test_sensor_waits_for_startup(board):
+    import clock
+
+    sensor = clock.TemperatureHumiditySensor()
+    assert sensor.read() is None
+    assert sensor.sensor is None
+
+    board.advance(clock.TemperatureHumiditySensor.STARTUP_MS)
+    assert sensor.read() == [board.temperature, board.humidity]
+
+def test_failed_read_keeps_last_reading(board):
+    import clock
+
+    sensor = clock.TemperatureHumiditySensor()
+    board.advance(clock.TemperatureHumiditySensor.STARTUP_MS)
+    assert sensor.read() == [21, 45]
+
+    board.dhtFails = True
+    board.temperature = 30
+    board.advance(clock.TemperatureHumiditySensor.READ_INTERVAL_MS)
+    assert sensor.read() == [21, 45]
+
+def test_main_runs_without_sensor(board):
+    import clock
+
+    board.dhtFails = True
+    hostboard.runClock(clock, 200)
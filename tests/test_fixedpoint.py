@@ -0,0 +1,13 @@
+import fixedbench
+
+"""
+The fixed point helpers stay within 1 LSB of the float code they replace, for
+every input the clock and candles use.
+"""
+
+def test_fixed_point_is_within_one_lsb_of_float():
+    servo, percent, random = fixedbench.maxError()
+
+    assert servo <= 1
+    assert percent <= 1
+    assert random <= 1
@@ -0,0 +1,21 @@
+import flicker
+from flicker import flickerPattern, steadyPattern, PATTERN_LENGTH
+
+"""
+Run the candles' patterns through the candleFlicker program in the PIO emulator
+and check every PWM period and entry has the expected timing.
+"""
+
+def test_candle_patterns_have_the_expected_timing():
+    # The candles on GPIO 22 and 27 seed their patterns with the pin
+    for seed in (22, 27):
+        for scale in (32, 64, 128, 256):
+            errors, periods, worstUs, cycles = flicker.check(flickerPattern(PATTERN_LENGTH, seed, scale))
+            assert errors == 0
+
+def test_steady_pattern_has_the_expected_timing():
+    pattern = steadyPattern(PATTERN_LENGTH, 128)
+    errors, periods, worstUs, cycles = flicker.check(pattern)
+
+    assert errors == 0
+    assert periods == PATTERN_LENGTH * 20
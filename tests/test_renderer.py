@@ -0,0 +1,137 @@
+import time
+
+from pixels import RecorderOutput, packGRB
+from renderer import Compositor, RingRenderer, dimTable
+
+"""
+Drive RingRenderer on a CPython thread, standing in for core 1, with a
+RecorderOutput standing in for the PIO state machine, and check the frames
+that reach the ring.
+"""
+
+NUM_LEDS = 60
+FULL = dimTable(65536)
+
+RED = packGRB(255, 0, 0)
+GREEN = packGRB(0, 255, 0)
+BLUE = packGRB(0, 0, 255)
+
+def startRenderer():
+    output = RecorderOutput(NUM_LEDS)
+    renderer = RingRenderer(output, NUM_LEDS, [pos for pos in range(256)], FULL)
+    renderer.start()
+    return renderer, output
+
+# Wait for every published command and animation to reach the output
+def settle(renderer, timeout=5.0):
+    end = time.monotonic() + timeout
+    while (renderer.waiting or renderer.busy()) and time.monotonic() < end:
+        time.sleep(0.01)
+    time.sleep(5 * RingRenderer.FRAME_MS / 1000)
+    assert not renderer.waiting and not renderer.busy()
+
+def test_commands_after_quick_ticks_are_not_dropped():
+    renderer, output = startRenderer()
+    try:
+        for sec in range(60):
+            renderer.tick(GREEN, sec)
+        renderer.markers(RED)
+        renderer.chase(BLUE)
+        settle(renderer)
+    finally:
+        renderer.stop()
+
+    markers = [renderer.secondPixel[sec] for sec in RingRenderer.MARKER_SECONDS]
+    for i in range(NUM_LEDS):
+        assert output.last[i] == (RED if i in markers else GREEN)
+
+def test_fill_after_ticks_clears_the_ring():
+    renderer, output = startRenderer()
+    try:
+        renderer.markers(RED)
+        for sec in range(60):
+            renderer.tick(GREEN, sec)
+        renderer.chase(BLUE)
+        renderer.markers(0)
+        renderer.fill(0)
+        settle(renderer)
+    finally:
+        renderer.stop()
+
+    assert list(output.last) == [0 for _ in range(NUM_LEDS)]
+
+def test_ticks_after_fill_are_kept():
+    renderer, output = startRenderer()
+    try:
+        for sec in range(60):
+            renderer.tick(GREEN, sec)
+        renderer.fill(0)
+        renderer.tick(BLUE, 10)
+        renderer.tick(RED, 10)
+        settle(renderer)
+    finally:
+        renderer.stop()
+
+    assert output.last[10] == RED
+    assert sum(1 for c in output.last if c) == 1
+
+def test_stop_shows_commands_published_before_it():
+    renderer, output = startRenderer()
+    renderer.fill(GREEN)
+    settle(renderer)
+
+    renderer.fill(0)
+    renderer.stop()
+
+    assert list(output.last) == [0 for _ in range(NUM_LEDS)]
+
+def test_dim_table_is_applied_by_the_render_loop():
+    renderer, output = startRenderer()
+    try:
+        renderer.fill(GREEN)
+        settle(renderer)
+        renderer.setDimTable(dimTable(32768))
+        settle(renderer)
+    finally:
+        renderer.stop()
+
+    assert renderer.compositor.dimTable is not FULL
+    assert list(output.last) == [packGRB(0, 127, 0) for _ in range(NUM_LEDS)]
+
+def test_compose_merges_each_layer_range():
+    compositor = Compositor(NUM_LEDS, FULL)
+    compositor.compose()
+    ranges = []
+    composeRange = compositor.composeRange
+    compositor.composeRange = lambda low, high: (ranges.append((low, high)), composeRange(low, high))
+
+    compositor.layers[Compositor.SECONDS].set(2, GREEN)
+    compositor.layers[Compositor.MARKERS].set(45, RED)
+    compositor.layers[Compositor.BACKGROUND].set(3, BLUE)
+    compositor.layers[Compositor.BACKGROUND].set(20, BLUE)
+    assert compositor.compose()
+
+    # The background range 3-20 touches the tick at 2 but not the marker at 45
+    assert ranges == [(2, 20), (45, 45)]
+    assert compositor.frame[2] == GREEN and compositor.frame[45] == RED
+    assert compositor.frame[3] == BLUE and compositor.frame[20] == BLUE and compositor.frame[30] == 0
+    assert not compositor.compose()
+
+def test_one_loop_renders_two_rings():
+    renderer, output = startRenderer()
+    minuteOutput = RecorderOutput(NUM_LEDS)
+    minutes = RingRenderer(minuteOutput, NUM_LEDS, [pos for pos in range(256)], FULL)
+    renderer.stop()
+    renderer.addRing(minutes)
+    renderer.start()
+    try:
+        renderer.tick(GREEN, 5)
+        minutes.tick(BLUE, 30)
+        settle(renderer)
+        settle(minutes)
+    finally:
+        renderer.stop()
+
+    assert output.last[5] == GREEN and sum(1 for c in output.last if c) == 1
+    assert minuteOutput.last[30] == BLUE and sum(1 for c in minuteOutput.last if c) == 1
+    assert not minutes.running
@@ -0,0 +1,92 @@
+import os
+import sensorlog
+from sensorlog import SensorLog, records, RECORD_SIZE
+
+"""
+The sensor log writes whole blocks, and finds where it left off from the
+block sequence numbers rather than a header rewritten on every flush.
+"""
+
+BLOCK = 256
+# The first record slot of each block holds its sequence number and count
+BLOCK_RECORDS = BLOCK // RECORD_SIZE - 1
+
+def appendRecords(log, first, n):
+    for stamp in range(first, first + n):
+        log.append(stamp, 20, 40, stamp & 0xFFFF)
+
+def test_writes_are_whole_aligned_blocks(tmp_path, monkeypatch):
+    path = str(tmp_path / "sensors.log")
+    log = SensorLog(path, capacity=4 * BLOCK_RECORDS, blockSize=BLOCK)
+    assert os.path.getsize(path) == 5 * BLOCK
+
+    header = open(path, "rb").read(BLOCK)
+    writes = []
+    realOpen = open
+
+    class Recorder(object):
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self.f.close()
+
+        def seek(self, offset):
+            self.offset = offset
+            self.f.seek(offset)
+
+        def write(self, data):
+            writes.append((self.offset, len(data)))
+            self.f.write(data)
+
+    monkeypatch.setattr(sensorlog, "open", lambda p, mode: Recorder(realOpen(p, mode)), raising=False)
+    appendRecords(log, 1, 3 * BLOCK_RECORDS)
+    monkeypatch.undo()
+
+    assert writes == [(BLOCK * (b + 1), BLOCK) for b in range(3)]
+    assert open(path, "rb").read(BLOCK) == header
+
+def test_reopen_carries_on_after_the_last_record(tmp_path):
+    path = str(tmp_path / "sensors.log")
+    log = SensorLog(path, capacity=4 * BLOCK_RECORDS, blockSize=BLOCK)
+    appendRecords(log, 1, BLOCK_RECORDS + 5)
+    log.flush()
+
+    log = SensorLog(path, capacity=4 * BLOCK_RECORDS, blockSize=BLOCK)
+    assert log.head == BLOCK_RECORDS + 5
+    appendRecords(log, BLOCK_RECORDS + 6, 10)
+    log.flush()
+
+    assert [r[0] for r in records(path)] == list(range(1, BLOCK_RECORDS + 16))
+
+def test_full_ring_drops_the_oldest_block(tmp_path):
+    path = str(tmp_path / "sensors.log")
+    log = SensorLog(path, capacity=4 * BLOCK_RECORDS, blockSize=BLOCK)
+    appendRecords(log, 1, 5 * BLOCK_RECORDS + 3)
+    log.flush()
+
+    log = SensorLog(path, capacity=4 * BLOCK_RECORDS, blockSize=BLOCK)
+    assert log.head == BLOCK_RECORDS + 3
+
+    stamps = [r[0] for r in records(path)]
+    assert stamps == list(range(2 * BLOCK_RECORDS + 1, 5 * BLOCK_RECORDS + 4))
+
+def test_clock_set_back_keeps_the_log_in_order(tmp_path):
+    path = str(tmp_path / "sensors.log")
+    log = SensorLog(path, capacity=4 * BLOCK_RECORDS, blockSize=BLOCK)
+    appendRecords(log, 1000, BLOCK_RECORDS)
+
+    # The clock goes back an hour
+    appendRecords(log, 940, 37)
+    log.flush()
+
+    log = SensorLog(path, capacity=4 * BLOCK_RECORDS, blockSize=BLOCK)
+    assert log.head == BLOCK_RECORDS + 37
+    appendRecords(log, 977, 3)
+    log.flush()
+
+    expected = list(range(1000, 1000 + BLOCK_RECORDS)) + list(range(940, 980))
+    assert [r[0] for r in records(path)] == expected
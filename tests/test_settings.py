@@ -0,0 +1,43 @@
+import settings
+from settings import SettingsStore
+
+"""
+Settings changed with a button are written after the quiet period, while other
+changes wait for the minimum interval between writes.
+"""
+
+def makeStore(tmp_path, monkeypatch, now):
+    monkeypatch.setattr(settings, "ticks_ms", lambda: now[0])
+    return SettingsStore(str(tmp_path / "settings"), ("volume", "colorIndex"), (4, 1), ("volume",))
+
+def test_urgent_change_is_written_after_the_quiet_period(tmp_path, monkeypatch):
+    now = [0]
+    store = makeStore(tmp_path, monkeypatch, now)
+    store.set("colorIndex", 2)
+    now[0] = SettingsStore.QUIET_MS
+    store.poll()
+    assert store.sequence == 1
+
+    now[0] = now[0] + 1000
+    store.set("volume", 1)
+    now[0] = now[0] + SettingsStore.QUIET_MS
+    store.poll()
+    assert store.sequence == 2
+
+    assert makeStore(tmp_path, monkeypatch, now).get("volume") == 1
+
+def test_other_changes_wait_for_the_interval(tmp_path, monkeypatch):
+    now = [0]
+    store = makeStore(tmp_path, monkeypatch, now)
+    store.set("colorIndex", 2)
+    now[0] = SettingsStore.QUIET_MS
+    store.poll()
+
+    store.set("colorIndex", 3)
+    now[0] = now[0] + SettingsStore.QUIET_MS
+    store.poll()
+    assert store.sequence == 1
+
+    now[0] = SettingsStore.QUIET_MS + SettingsStore.MIN_INTERVAL_MS
+    store.poll()
+    assert store.sequence == 2
@@ -0,0 +1,16 @@
+import ws2812sim
+
+"""
+Run the ws2812 program in the PIO emulator: the decoded bits must match the
+frame with datasheet timing, and each LED must take the same time whatever the
+ring size.
+"""
+
+def test_frame_decodes_within_spec():
+    frame = [(0xA55AC3 + 0x010203 * i) & 0xFFFFFF for i in range(60)]
+
+    assert ws2812sim.check(frame)
+
+def test_time_per_led_is_constant():
+    for count, us, perLed in ws2812sim.frameTimes():
+        assert abs(perLed - ws2812sim.LED_US) < 0.5
@@ -0,0 +1,153 @@
+import sys
+import pioemu
+from pixels import ws2812Program, PioOutput, PULL_THRESH
+
+"""
+WS2812 simulator
+================
+
+Run the ws2812 PIO program from pixels.py in the host PIO emulator and check
+the waveform it produces, without a logic analyser.
+
+For a frame the state machine is fed the same words PioOutput sends, and the
+side-set pin trace is decoded back into bits. The report gives the high and low
+time of 0 and 1 bits against the WS2812 datasheet (each +/- 150 ns), checks
+that the decoded bits match the frame, and gives the frame transmission time.
+Ring sizes are then compared to show that the frame time grows linearly with
+the number of LEDs. If any check fails the simulator exits with status 1.
+
+Run with:
+    python ws2812sim.py [numLeds] [--vcd trace.vcd]
+"""
+
+# WS2812 bit timing from the datasheet, (nominal, tolerance) in ns
+T0H = (400, 150)
+T0L = (850, 150)
+T1H = (800, 150)
+T1L = (450, 150)
+
+LED_COUNTS = (60, 120, 144, 240)
+
+# 24 bits of 1.25 us each
+LED_US = 30.0
+
+"""
+Run a frame through the ws2812 program.
+
+Args:
+    frame (list): Packed GRB value for every LED.
+    freq (int): State machine frequency.
+
+Returns:
+    pioemu.StateMachine: The state machine, stalled after the last bit.
+"""
+def simulate(frame, freq=PioOutput.FREQ):
+    sm = pioemu.StateMachine(pioemu.assemble(ws2812Program), shiftRight=False,
+                             autopull=True, pullThresh=PULL_THRESH)
+
+    # As PioOutput sends them: GRB in the top 24 bits of each word
+    sm.put([(c << 8) & 0xFFFFFFFF for c in frame])
+    sm.run(len(frame) * PULL_THRESH * 100)
+    return sm
+
+"""
+Decode the pin trace into bits.
+
+Args:
+    sm (pioemu.StateMachine): The state machine after simulate.
+
+Returns:
+    list: (bit, high cycles, low cycles) for every bit sent.
+"""
+def decode(sm):
+    changes = sm.trace[1:] + [(sm.cycle, 1)]
+    bits = []
+    for k in range(0, len(changes) - 1, 2):
+        rise = changes[k][0]
+        fall = changes[k + 1][0]
+        nextRise = changes[k + 2][0] if k + 2 < len(changes) else sm.cycle
+        high = fall - rise
+        bits.append((1 if high * 2 > nextRise - rise else 0, high, nextRise - rise - high))
+    return bits
+
+def expectedBits(frame):
+    bits = []
+    for c in frame:
+        for shift in range(PULL_THRESH - 1, -1, -1):
+            bits.append((c >> shift) & 1)
+    return bits
+
+def nanoseconds(cycles, freq):
+    return cycles * 1000000000 // freq
+
+"""
+Check one frame and print its timing.
+
+Returns:
+    bool: True if every bit matched and met the datasheet timing.
+"""
+def check(frame, freq=PioOutput.FREQ, vcdPath=None):
+    sm = simulate(frame, freq)
+    bits = decode(sm)
+    ok = [bit for bit, high, low in bits] == expectedBits(frame)
+
+    print("LEDs:", len(frame), " bits:", len(bits), " decoded bits match frame:", ok)
+
+    # The last bit's low time runs into the reset, so it is left out
+    for value, name, highSpec, lowSpec in ((0, "0 bit", T0H, T0L), (1, "1 bit", T1H, T1L)):
+        durations = set((high, low) for bit, high, low in bits[:-1] if bit == value)
+        for high, low in sorted(durations):
+            highNs = nanoseconds(high, freq)
+            lowNs = nanoseconds(low, freq)
+            inSpec = abs(highNs - highSpec[0]) <= highSpec[1] and abs(lowNs - lowSpec[0]) <= lowSpec[1]
+            ok = ok and inSpec
+            print("  {}: high {} ns, low {} ns, datasheet {}/{} ns {}".format(
+                name, highNs, lowNs, highSpec[0], lowSpec[0], "ok" if inSpec else "OUT OF SPEC"))
+
+    print("  frame time: {} us".format(nanoseconds(sm.cycle, freq) // 1000))
+
+    if vcdPath:
+        pioemu.writeVcd(sm.trace, vcdPath, freq, "ws2812", sm.cycle)
+        print("  trace written to", vcdPath)
+
+    return ok
+
+"""
+Get the transmission time per LED for a frame of each ring size.
+
+Returns:
+    list: (LEDs, frame time in us, us per LED) for each of LED_COUNTS.
+"""
+def frameTimes(freq=PioOutput.FREQ):
+    times = []
+    for count in LED_COUNTS:
+        sm = simulate([0xFFFFFF for _ in range(count)], freq)
+        us = nanoseconds(sm.cycle, freq) / 1000
+        times.append((count, us, us / count))
+    return times
+
+def main():
+    args = sys.argv[1:]
+    vcdPath = None
+    if ("--vcd" in args):
+        i = args.index("--vcd")
+        vcdPath = args[i + 1]
+        del args[i : i + 2]
+    numLeds = int(args[0]) if args else 60
+
+    # A pattern with both bit values in every byte position
+    frame = [(0xA55AC3 + 0x010203 * i) & 0xFFFFFF for i in range(numLeds)]
+    ok = check(frame, vcdPath=vcdPath)
+
+    print("LEDs   frame us   us per LED")
+    for count, us, perLed in frameTimes():
+        print("{:>4} {:>10.1f} {:>12.3f}".format(count, us, perLed))
+        ok = ok and abs(perLed - LED_US) < 0.5
+
+    if not ok:
+        print("FAIL")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()